@@ -11,6 +11,7 @@ from datetime import datetime, timedelta
 from app.core.config import Settings
 from app.services.audio_processor import AudioProcessor
 from app.services.gpt_processor import GPTProcessor
+from app.services.transcription_pool import close_transcription_pool
 from app.services.websocket_manager import ConnectionManager
 from app.schemas.user import User, UserCreate, UserInDB
 from app.schemas.conversation import Conversation, ConversationCreate
@@ -36,6 +37,11 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 # Initialize connection manager
 manager = ConnectionManager()
 
+@app.on_event("shutdown")
+def stop_transcription_pool():
+    # the pool's worker processes and shared memory would otherwise outlive the server
+    close_transcription_pool()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -1,11 +1,12 @@
 import io
 import wave
-import tempfile
-import os
 from typing import Optional
-import whisper
+import numpy as np
 import torch
+import whisper
 from pydantic import BaseModel
+from app.services.inference_engine import BatchConfig, get_inference_engine
+from app.services.transcription_pool import PoolConfig, get_transcription_pool
 
 class AudioConfig(BaseModel):
     sample_rate: int = 16000
@@ -13,48 +14,53 @@ class AudioConfig(BaseModel):
     sample_width: int = 2
     model_type: str = "base"
     language: str = "en"
+    max_batch_size: int = 8
+    max_batch_wait_ms: float = 5.0
+    # "batch" shares one in-process model; "process_pool" runs a model per worker process
+    engine: str = "batch"
+    num_workers: int = 2
+    threads_per_worker: Optional[int] = None
 
 class AudioProcessor:
     def __init__(self, config: Optional[AudioConfig] = None):
         self.config = config or AudioConfig()
-        self.model = self._load_model()
+        if self.config.engine == "process_pool":
+            self.engine = get_transcription_pool(PoolConfig(
+                model_type=self.config.model_type,
+                language=self.config.language,
+                num_workers=self.config.num_workers,
+                threads_per_worker=self.config.threads_per_worker
+            ))
+        else:
+            self.engine = get_inference_engine(BatchConfig(
+                model_type=self.config.model_type,
+                language=self.config.language,
+                max_batch_size=self.config.max_batch_size,
+                max_wait_ms=self.config.max_batch_wait_ms
+            ))
         print(f"Using GPU for audio processing: {torch.cuda.is_available()}")
 
-    def _load_model(self) -> whisper.Whisper:
-        """Load the Whisper model."""
-        return whisper.load_model(self.config.model_type)
+    def _to_float32(self, audio_data: bytes) -> np.ndarray:
+        """Convert 16-bit PCM to the mono 16 kHz float32 array whisper consumes."""
+        audio = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
+        if self.config.channels > 1:
+            audio = audio[:len(audio) - len(audio) % self.config.channels]
+            audio = audio.reshape(-1, self.config.channels).mean(axis=1)
+        if self.config.sample_rate != whisper.audio.SAMPLE_RATE and len(audio) > 0:
+            duration = len(audio) / self.config.sample_rate
+            positions = np.arange(int(duration * whisper.audio.SAMPLE_RATE)) * (self.config.sample_rate / whisper.audio.SAMPLE_RATE)
+            audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+        return audio
 
     async def process_audio(self, audio_data: bytes) -> Optional[str]:
         """Process audio data and return transcription."""
         try:
-            # Create temporary WAV file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                temp_path = temp_file.name
-                
-                # Write audio data to WAV file
-                with wave.open(temp_path, "wb") as wav_file:
-                    wav_file.setnchannels(self.config.channels)
-                    wav_file.setsampwidth(self.config.sample_width)
-                    wav_file.setframerate(self.config.sample_rate)
-                    wav_file.writeframes(audio_data)
-
-            # Transcribe audio
-            result = self.model.transcribe(
-                temp_path,
-                language=self.config.language,
-                fp16=torch.cuda.is_available()
-            )
-            
-            return result["text"].strip()
+            # Segments from all connections go to the shared engine: one batched model run or a worker process
+            return await self.engine.transcribe(self._to_float32(audio_data))
 
         except Exception as e:
             print(f"Error processing audio: {e}")
             return None
-            
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
 
     async def validate_audio(self, audio_data: bytes) -> bool:
         """Validate audio data format and quality."""
@@ -69,4 +75,4 @@ class AudioProcessor:
                         return False
             return True
         except Exception:
-            return False
\ No newline at end of file
+            return False
@@ -2,6 +2,7 @@ import openai
 from typing import Optional
 from pydantic import BaseModel
 from app.core.config import Settings
+from app.services.prompt_builder import fit_messages
 
 settings = Settings()
 openai.api_key = settings.OPENAI_API_KEY
@@ -12,12 +13,13 @@ class GPTConfig(BaseModel):
     max_tokens: int = 150
     presence_penalty: float = 0.0
     frequency_penalty: float = 0.0
+    # Input tokens of conversation history sent with every request, newest messages first
+    history_token_budget: int = 2000
 
 class GPTProcessor:
     def __init__(self, config: Optional[GPTConfig] = None):
         self.config = config or GPTConfig()
         self.conversation_history = []
-        self.max_history = 10
 
     def _create_prompt(self, transcript: str) -> str:
         """Create a prompt for GPT based on the transcript."""
@@ -35,10 +37,9 @@ Response:"""
     async def generate_response(self, transcript: str) -> str:
         """Generate a response using GPT-3.5."""
         try:
-            # Update conversation history
+            # Update conversation history, keeping only what fits in the token budget
             self.conversation_history.append({"role": "user", "content": transcript})
-            if len(self.conversation_history) > self.max_history:
-                self.conversation_history.pop(0)
+            self.conversation_history = fit_messages(self.conversation_history, self.config.history_token_budget)
 
             # Create messages for the API call
             messages = [
@@ -0,0 +1,116 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import numpy as np
+import torch
+import whisper
+from pydantic import BaseModel
+
+class BatchConfig(BaseModel):
+    model_type: str = "base"
+    language: str = "en"
+    max_batch_size: int = 8
+    max_wait_ms: float = 5.0
+    # the thresholds model.transcribe uses to decide a decode needs its temperature fallback
+    compression_ratio_threshold: float = 2.4
+    logprob_threshold: float = -1.0
+    no_speech_threshold: float = 0.6
+
+class BatchInferenceEngine:
+    def __init__(self, config: Optional[BatchConfig] = None):
+        self.config = config or BatchConfig()
+        self.model = whisper.load_model(self.config.model_type)
+        self.options = whisper.DecodingOptions(
+            language=self.config.language,
+            without_timestamps=True,
+            fp16=torch.cuda.is_available()
+        )
+        self._requests: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, audio: np.ndarray) -> Future:
+        """Queue a mono 16 kHz float32 segment for the next batch."""
+        future: Future = Future()
+        self._requests.put((audio, future))
+        return future
+
+    async def transcribe(self, audio: np.ndarray) -> str:
+        """Transcribe a segment, sharing the model run with other connections."""
+        return await asyncio.wrap_future(self.submit(audio))
+
+    def _run(self):
+        """Gather segments for up to max_wait_ms and decode them as one batch."""
+        max_wait = self.config.max_wait_ms / 1000
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + max_wait
+            while len(batch) < self.config.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._decode_batch(batch)
+
+    def _decode_batch(self, batch: List[Tuple[np.ndarray, Future]]):
+        """Decode the segments that fit whisper's 30 second window as one batch and the rest one by one."""
+        short = [(audio, future) for audio, future in batch if len(audio) <= whisper.audio.N_SAMPLES]
+        sequential = [(audio, future) for audio, future in batch if len(audio) > whisper.audio.N_SAMPLES]
+        if short:
+            try:
+                mel = torch.stack([
+                    whisper.log_mel_spectrogram(whisper.pad_or_trim(audio))
+                    for audio, _ in short
+                ])
+                results = whisper.decode(self.model, mel.to(self.model.device), self.options)
+            except Exception as e:
+                print(f"Error in batched inference: {e}")
+                for _, future in short:
+                    future.set_exception(e)
+            else:
+                for (audio, future), result in zip(short, results):
+                    if self._needs_fallback(result):
+                        sequential.append((audio, future))
+                    else:
+                        future.set_result(result.text.strip())
+
+        for audio, future in sequential:
+            try:
+                result = self.model.transcribe(
+                    audio,
+                    language=self.config.language,
+                    fp16=self.options.fp16,
+                    compression_ratio_threshold=self.config.compression_ratio_threshold,
+                    logprob_threshold=self.config.logprob_threshold,
+                    no_speech_threshold=self.config.no_speech_threshold
+                )
+            except Exception as e:
+                print(f"Error in inference: {e}")
+                future.set_exception(e)
+            else:
+                future.set_result(result["text"].strip())
+
+    def _needs_fallback(self, result) -> bool:
+        """Whether model.transcribe would have retried this greedy decode at a higher temperature."""
+        if result.no_speech_prob > self.config.no_speech_threshold and result.avg_logprob < self.config.logprob_threshold:
+            return False
+        return (result.compression_ratio > self.config.compression_ratio_threshold
+                or result.avg_logprob < self.config.logprob_threshold)
+
+_engine: Optional[BatchInferenceEngine] = None
+_engine_lock = threading.Lock()
+
+def get_inference_engine(config: Optional[BatchConfig] = None) -> BatchInferenceEngine:
+    """Return the process-wide engine, loading the model on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = BatchInferenceEngine(config)
+        return _engine
@@ -0,0 +1,51 @@
+from functools import lru_cache
+from typing import Dict, List
+
+ENCODING_NAME = "cl100k_base"
+# Rough size of an English token, used when tiktoken is not installed
+CHARACTERS_PER_TOKEN = 4
+# Role and separator tokens the chat format adds to every message
+TOKENS_PER_MESSAGE = 4
+
+@lru_cache(maxsize=None)
+def _get_encoding():
+    """Load the tokenizer once per process."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding(ENCODING_NAME)
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Count the tokens of a text, caching the result for repeated history messages."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + CHARACTERS_PER_TOKEN - 1) // CHARACTERS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Keep the last tokens of a text that fit in the budget."""
+    if budget <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[-budget * CHARACTERS_PER_TOKEN:]
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[-budget:])
+
+def fit_messages(messages: List[Dict[str, str]], budget: int) -> List[Dict[str, str]]:
+    """Return the newest messages whose tokens fit in the budget, oldest first."""
+    fitted: List[Dict[str, str]] = []
+    used = 0
+    for message in reversed(messages):
+        tokens = count_tokens(message["content"]) + TOKENS_PER_MESSAGE
+        if used + tokens > budget:
+            if not fitted:
+                content = truncate_to_tokens(message["content"], budget - TOKENS_PER_MESSAGE)
+                fitted.append({**message, "content": content})
+            break
+        fitted.append(message)
+        used += tokens
+    fitted.reverse()
+    return fitted
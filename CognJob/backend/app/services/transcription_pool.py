@@ -0,0 +1,235 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+WHISPER_SAMPLE_RATE = 16000
+_POLL_INTERVAL_S = 0.5
+
+class PoolConfig(BaseModel):
+    model_type: str = "base"
+    language: str = "en"
+    num_workers: int = 2
+    threads_per_worker: Optional[int] = None
+    max_segment_seconds: int = 30
+    ready_timeout_s: float = 300.0
+    health_check_interval_s: float = 5.0
+    ping_timeout_s: float = 2.0
+    # a request running past this many times its audio length, plus the margin, counts as hung
+    request_timeout_factor: float = 10.0
+    request_timeout_margin_s: float = 30.0
+
+def _run_worker(connection: Connection, memory_name: str, model_type: str, language: str, threads: int):
+    """Load the model once, then transcribe the segments the parent writes into shared memory."""
+    # thread pools size themselves on import, so the limit is set before torch is loaded
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    import torch
+    import whisper
+    torch.set_num_threads(threads)
+    model = whisper.load_model(model_type)
+    fp16 = torch.cuda.is_available()
+
+    memory = shared_memory.SharedMemory(name=memory_name)
+    connection.send(("ready", None))
+    try:
+        while True:
+            command, length = connection.recv()
+            if command == "stop":
+                break
+            if command == "ping":
+                connection.send(("pong", None))
+                continue
+            audio = np.ndarray((length,), dtype=np.float32, buffer=memory.buf).copy()
+            try:
+                result = model.transcribe(audio, language=language, fp16=fp16)
+                connection.send(("done", result["text"].strip()))
+            except Exception as e:
+                connection.send(("error", str(e)))
+    finally:
+        memory.close()
+
+class _Worker:
+    def __init__(self, context, config: PoolConfig, threads: int):
+        self.context = context
+        self.config = config
+        self.threads = threads
+        size = config.max_segment_seconds * WHISPER_SAMPLE_RATE * np.dtype(np.float32).itemsize
+        self.memory = shared_memory.SharedMemory(create=True, size=size)
+        self.process = None
+        self.connection: Optional[Connection] = None
+
+    def start(self):
+        """Spawn the worker process and wait until its model is loaded."""
+        self.connection, child_connection = self.context.Pipe()
+        self.process = self.context.Process(
+            target=_run_worker,
+            args=(child_connection, self.memory.name, self.config.model_type, self.config.language, self.threads),
+            daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        if self.wait_for_reply(self.config.ready_timeout_s) is None:
+            raise RuntimeError("Transcription worker failed to start")
+
+    def wait_for_reply(self, timeout: Optional[float]) -> Optional[Tuple[str, Optional[str]]]:
+        """Return the next reply, or None if the worker died or timed out first."""
+        waited = 0.0
+        while timeout is None or waited < timeout:
+            step = _POLL_INTERVAL_S if timeout is None else min(_POLL_INTERVAL_S, timeout - waited)
+            try:
+                if self.connection.poll(step):
+                    return self.connection.recv()
+            except (EOFError, OSError):
+                return None
+            if not self.process.is_alive():
+                return None
+            waited += step
+        return None
+
+    def stop(self):
+        """Ask the worker to exit, killing it if it does not."""
+        if self.process is not None and self.process.is_alive():
+            try:
+                self.connection.send(("stop", 0))
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(self.config.ping_timeout_s)
+            if self.process.is_alive():
+                self.process.kill()
+        if self.connection is not None:
+            self.connection.close()
+
+class TranscriptionPool:
+    def __init__(self, config: Optional[PoolConfig] = None):
+        self.config = config or PoolConfig()
+        self._context = multiprocessing.get_context("spawn")
+        self._max_samples = self.config.max_segment_seconds * WHISPER_SAMPLE_RATE
+        threads = self.config.threads_per_worker or max(1, (os.cpu_count() or 1) // self.config.num_workers)
+        self._workers = [_Worker(self._context, self.config, threads) for _ in range(self.config.num_workers)]
+        self._idle: List[_Worker] = []
+        self._condition = threading.Condition()
+        self._closed = False
+
+        for worker in self._workers:
+            worker.start()
+            self._idle.append(worker)
+
+        self._health_check = threading.Thread(target=self._check_health, daemon=True)
+        self._health_check.start()
+
+    async def transcribe(self, audio: np.ndarray) -> str:
+        """Transcribe a mono 16 kHz float32 segment in one of the worker processes."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._run, audio)
+
+    def _run(self, audio: np.ndarray) -> str:
+        """Transcribe a segment, splitting one longer than the shared memory block into consecutive windows."""
+        windows = [audio[start:start + self._max_samples] for start in range(0, len(audio), self._max_samples)]
+        texts = [self._run_window(window) for window in windows]
+        return " ".join(text for text in texts if text)
+
+    def _run_window(self, audio: np.ndarray) -> str:
+        """Copy the segment into an idle worker's shared memory and wait for its text."""
+        worker = self._acquire()
+        try:
+            np.ndarray((len(audio),), dtype=np.float32, buffer=worker.memory.buf)[:] = audio
+            worker.connection.send(("transcribe", len(audio)))
+            timeout = (self.config.request_timeout_factor * len(audio) / WHISPER_SAMPLE_RATE
+                       + self.config.request_timeout_margin_s)
+            reply = worker.wait_for_reply(timeout)
+        except (BrokenPipeError, OSError):
+            reply = None
+        if reply is None:
+            self._respawn(worker)
+            raise RuntimeError("Transcription worker crashed or timed out")
+        self._release(worker)
+        status, text = reply
+        if status == "error":
+            raise RuntimeError(text)
+        return text
+
+    def _acquire(self) -> _Worker:
+        """Wait for an idle worker."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._idle or self._closed)
+            if self._closed:
+                raise RuntimeError("Transcription pool is closed")
+            return self._idle.pop()
+
+    def _release(self, worker: _Worker):
+        """Return a worker to the idle list."""
+        with self._condition:
+            self._idle.append(worker)
+            self._condition.notify()
+
+    def _respawn(self, worker: _Worker):
+        """Replace a crashed or hung worker in the background."""
+        print("Transcription worker stopped responding, restarting it")
+
+        def restart():
+            worker.stop()
+            try:
+                worker.start()
+            except RuntimeError as e:
+                print(f"Error restarting transcription worker: {e}")
+                return
+            self._release(worker)
+
+        threading.Thread(target=restart, daemon=True).start()
+
+    def _check_health(self):
+        """Ping the idle workers periodically and respawn the ones that do not answer."""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed, self.config.health_check_interval_s)
+                if self._closed:
+                    return
+                idle, self._idle = self._idle, []
+            for worker in idle:
+                try:
+                    worker.connection.send(("ping", 0))
+                    reply = worker.wait_for_reply(self.config.ping_timeout_s)
+                except (BrokenPipeError, OSError):
+                    reply = None
+                if reply is None:
+                    self._respawn(worker)
+                else:
+                    self._release(worker)
+
+    def close(self):
+        """Stop the workers and free their shared memory."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.stop()
+            worker.memory.close()
+            worker.memory.unlink()
+
+_pool: Optional[TranscriptionPool] = None
+_pool_lock = threading.Lock()
+
+def get_transcription_pool(config: Optional[PoolConfig] = None) -> TranscriptionPool:
+    """Return the process-wide pool, starting its workers on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TranscriptionPool(config)
+        return _pool
+
+def close_transcription_pool():
+    """Stop the process-wide pool, if one was started, so its workers and shared memory do not leak."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
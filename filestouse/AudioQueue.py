@@ -0,0 +1,134 @@
+import threading
+from collections import deque
+from datetime import timedelta
+from AudioTranscriber import PHRASE_TIMEOUT
+from Metrics import metrics
+
+# what put does when a source already has max_chunks waiting
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+MERGE = "merge"
+POLICIES = (BLOCK, DROP_OLDEST, MERGE)
+
+MAX_QUEUED_CHUNKS = 8
+# 30 seconds of the 16 kHz mono 16-bit audio the recorders deliver; merged chunks never grow past this
+MAX_MERGED_BYTES = 30 * 16000 * 2
+
+class SourceAudioQueue:
+    """
+    Holds a separate queue of ``(who_spoke, data, time_spoken, trace_id)`` chunks for every audio source.
+
+    Transcription workers ``claim`` a source together with every chunk it has pending and ``release`` it
+    when they are done, so a pool of workers can transcribe different speakers at the same time while
+    the chunks of any one speaker are still processed one batch at a time and in order. Handing over the
+    whole backlog lets a worker that fell behind catch up with a single inference. ``run_claimed`` runs a
+    function while a source is claimed, so state a worker uses can be reset without racing it.
+
+    Each source holds at most ``max_chunks`` chunks. When it is full, ``policy`` decides what happens:
+    ``BLOCK`` waits for a worker to claim the backlog (or drops the new chunk if the caller cannot
+    wait), ``DROP_OLDEST`` discards the oldest chunk, and ``MERGE`` appends the new audio to the newest
+    chunk until that reaches ``max_merged_bytes``, after which the oldest chunk is dropped. ``MERGE`` also
+    drops the oldest chunk instead when the new one was spoken more than ``PHRASE_TIMEOUT`` seconds after
+    the newest, so the pause between two phrases survives. Every drop
+    is counted in ``audio_queue.dropped.<source>`` and ``audio_queue.dropped_bytes.<source>``.
+    """
+    def __init__(self, sources, max_chunks=MAX_QUEUED_CHUNKS, policy=MERGE, max_merged_bytes=MAX_MERGED_BYTES):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown audio queue policy: {policy}")
+        self.queues = {source: deque() for source in sources}
+        self.claimed = set()
+        self.pending = {source: [] for source in sources}
+        self.condition = threading.Condition()
+        self.max_chunks = max_chunks
+        self.policy = policy
+        self.max_merged_bytes = max_merged_bytes
+
+    def put(self, item, block=True, timeout=None):
+        # returns False when the chunk itself was dropped; with block=False this never waits
+        source = item[0]
+        with self.condition:
+            queue = self.queues[source]
+            if len(queue) >= self.max_chunks:
+                if self.policy == BLOCK:
+                    if not block or not self.condition.wait_for(lambda: len(queue) < self.max_chunks, timeout):
+                        self.record_drop(source, item)
+                        return False
+                elif (self.policy == MERGE and len(queue[-1][1]) + len(item[1]) <= self.max_merged_bytes
+                      and item[2] - queue[-1][2] <= timedelta(seconds=PHRASE_TIMEOUT)):
+                    # the merged chunk keeps the trace of its oldest audio and the time of its newest
+                    tail = queue[-1]
+                    queue[-1] = (source, tail[1] + item[1], item[2]) + tuple(tail[3:])
+                    metrics.increment(f"audio_queue.merged.{source}")
+                    return True
+                else:
+                    self.record_drop(source, queue.popleft())
+            queue.append(item)
+            metrics.set_gauge(f"audio_queue.depth.{source}", len(queue))
+            self.condition.notify_all()
+            return True
+
+    def record_drop(self, source, item):
+        metrics.increment(f"audio_queue.dropped.{source}")
+        metrics.increment(f"audio_queue.dropped_bytes.{source}", len(item[1]))
+
+    def claim(self):
+        with self.condition:
+            while True:
+                ready = [source for source, queue in self.queues.items() if queue and source not in self.claimed]
+                if ready:
+                    # the source whose oldest chunk waited longest goes first, so work stays in timestamp order
+                    source = min(ready, key=lambda source: self.queues[source][0][2])
+                    items = list(self.queues[source])
+                    self.queues[source].clear()
+                    self.claimed.add(source)
+                    metrics.set_gauge(f"audio_queue.depth.{source}", 0)
+                    # producers blocked on a full queue can continue
+                    self.condition.notify_all()
+                    return items
+                self.condition.wait()
+
+    def release(self, source):
+        # functions handed to run_claimed while the source was busy run before anyone else can claim it
+        while True:
+            with self.condition:
+                functions, self.pending[source] = self.pending[source], []
+                if not functions:
+                    self.claimed.discard(source)
+                    self.condition.notify_all()
+                    return
+            for function in functions:
+                try:
+                    function()
+                except Exception as e:
+                    # the claim still has to be given back, or no worker could take this source again
+                    print(f"[ERROR] Running a deferred function for {source} failed: {e}")
+
+    def run_claimed(self, source, function):
+        # runs right away if no worker holds the source, otherwise when the worker releases it; never waits
+        with self.condition:
+            if source in self.claimed:
+                self.pending[source].append(function)
+                return
+            self.claimed.add(source)
+        try:
+            function()
+        finally:
+            self.release(source)
+
+    def qsize(self, source=None):
+        with self.condition:
+            if source is not None:
+                return len(self.queues[source])
+            return sum(len(queue) for queue in self.queues.values())
+
+    def is_idle(self):
+        # nothing queued and no worker still transcribing a claimed backlog
+        with self.condition:
+            return not self.claimed and not any(self.queues.values())
+
+    def clear(self):
+        with self.condition:
+            for source, queue in self.queues.items():
+                queue.clear()
+                metrics.set_gauge(f"audio_queue.depth.{source}", 0)
+            self.condition.notify_all()
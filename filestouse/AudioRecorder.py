@@ -1,10 +1,16 @@
 import custom_speech_recognition as sr
 import pyaudiowpatch as pyaudio
+from AudioResampler import StreamResampler
+from Metrics import metrics
 from datetime import datetime
 
 RECORD_TIMEOUT = 3
+TRANSCRIPTION_SAMPLE_RATE = 16000
 ENERGY_THRESHOLD = 1000
 DYNAMIC_ENERGY_THRESHOLD = False
+# frames per window the listener measures, and per block the device hands to the capture callback
+ANALYSIS_WINDOW_FRAMES = 1024
+CAPTURE_BLOCK_FRAMES = 4096
 
 class BaseRecorder:
     def __init__(self, source, source_name):
@@ -18,6 +24,18 @@ class BaseRecorder:
         self.source = source
         self.source_name = source_name
 
+        # format of the audio this recorder puts into the queue
+        self.SAMPLE_RATE = source.SAMPLE_RATE
+        self.SAMPLE_WIDTH = source.SAMPLE_WIDTH
+        self.channels = source.channels
+        self.resampler = None
+
+    def convert_for_transcription(self, sample_rate):
+        # converting once at capture means the transcriber never resamples the same audio again
+        self.resampler = StreamResampler(self.source.SAMPLE_RATE, sample_rate, self.source.channels)
+        self.SAMPLE_RATE = sample_rate
+        self.channels = 1
+
     def adjust_for_noise(self, device_name, msg):
         print(f"[INFO] Adjusting for ambient noise from {device_name}. " + msg)
         with self.source:
@@ -26,14 +44,27 @@ class BaseRecorder:
 
     def record_into_queue(self, audio_queue):
         def record_callback(_, audio:sr.AudioData) -> None:
+            trace_id = metrics.start_trace()
             data = audio.get_raw_data()
-            audio_queue.put((self.source_name, data, datetime.utcnow()))
+            if self.resampler is not None:
+                data = self.resampler.process(data)
+            # the listener thread must keep reading the device, so a full queue never makes it wait
+            audio_queue.put((self.source_name, data, datetime.utcnow(), trace_id), block=False)
 
-        self.recorder.listen_in_background(self.source, record_callback, phrase_time_limit=RECORD_TIMEOUT)
+        # one preallocated buffer holds every phrase, with room for the pause kept around it
+        frame_width = self.source.SAMPLE_WIDTH * self.source.channels
+        audio_buffer = sr.AudioBuffer(initial_size=(RECORD_TIMEOUT + 2) * self.source.SAMPLE_RATE * frame_width)
+        self.recorder.listen_in_background(self.source, record_callback, phrase_time_limit=RECORD_TIMEOUT, audio_buffer=audio_buffer)
 
 class DefaultMicRecorder(BaseRecorder):
     def __init__(self):
-        super().__init__(source=sr.Microphone(sample_rate=16000), source_name="You")
+        source = sr.Microphone(sample_rate=16000,
+                               chunk_size=ANALYSIS_WINDOW_FRAMES,
+                               callback_mode=True,
+                               frames_per_buffer=CAPTURE_BLOCK_FRAMES)
+        super().__init__(source=source, source_name="You")
+
+    def calibrate(self):
         self.adjust_for_noise("Default Mic", "Please make some noise from the Default Mic...")
 
 class DefaultSpeakerRecorder(BaseRecorder):
@@ -53,7 +84,12 @@ class DefaultSpeakerRecorder(BaseRecorder):
         source = sr.Microphone(speaker=True,
                                device_index= default_speakers["index"],
                                sample_rate=int(default_speakers["defaultSampleRate"]),
-                               chunk_size=pyaudio.get_sample_size(pyaudio.paInt16),
-                               channels=default_speakers["maxInputChannels"])
+                               chunk_size=ANALYSIS_WINDOW_FRAMES,
+                               channels=default_speakers["maxInputChannels"],
+                               callback_mode=True,
+                               frames_per_buffer=CAPTURE_BLOCK_FRAMES)
         super().__init__(source=source, source_name="Speaker")
-        self.adjust_for_noise("Default Speaker", "Please make or play some noise from the Default Speaker...")
\ No newline at end of file
+        self.convert_for_transcription(TRANSCRIPTION_SAMPLE_RATE)
+
+    def calibrate(self):
+        self.adjust_for_noise("Default Speaker", "Please make or play some noise from the Default Speaker...")
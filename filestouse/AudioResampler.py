@@ -0,0 +1,64 @@
+import numpy as np
+from math import gcd
+
+TAPS_PER_PHASE = 24
+CUTOFF = 0.9
+
+class StreamResampler:
+    """
+    Downmixes interleaved 16-bit PCM to mono and resamples it with a polyphase windowed-sinc filter.
+
+    The rate ratio is reduced to ``up / down``, and every output sample is the dot product of
+    ``TAPS_PER_PHASE`` input samples with one phase of the filter, computed for a whole chunk at once.
+    The last input samples and the output position are carried over between calls, so chunks of a
+    stream can be converted one at a time as they are captured, without clicks at chunk boundaries.
+    """
+    def __init__(self, input_rate, output_rate=16000, channels=1, taps_per_phase=TAPS_PER_PHASE):
+        divisor = gcd(int(input_rate), int(output_rate))
+        self.up = int(output_rate) // divisor
+        self.down = int(input_rate) // divisor
+        self.channels = channels
+        self.taps_per_phase = taps_per_phase
+
+        # low-pass below the lower of the two Nyquist frequencies, at the upsampled rate
+        taps = np.arange(taps_per_phase * self.up) - (taps_per_phase * self.up - 1) / 2
+        cutoff = CUTOFF * 0.5 / max(self.up, self.down)
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.kaiser(len(taps), 8.0)
+        prototype *= self.up / prototype.sum()
+        # phases[p][m] is the weight of the m-th oldest sample in a window, for output phase p
+        self.phases = prototype.reshape(taps_per_phase, self.up).T[:, ::-1].astype(np.float32)
+        self.reset()
+
+    def reset(self):
+        self.history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        self.remainder = b""
+        self.received = 0
+        self.produced = 0
+
+    def process(self, data):
+        frame_width = 2 * self.channels
+        data = self.remainder + bytes(data)
+        usable = len(data) - len(data) % frame_width
+        self.remainder = data[usable:]
+        samples = np.frombuffer(data, dtype=np.int16, count=usable // 2).astype(np.float32)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        if self.up == self.down:
+            return samples.astype(np.int16).tobytes()
+
+        signal = np.concatenate((self.history, samples))
+        first = self.received - len(self.history)  # stream position of signal[0]
+        self.received += len(samples)
+        self.history = signal[len(signal) - len(self.history):]
+
+        # output n needs input samples up to (n * down) // up
+        end = (self.received * self.up + self.down - 1) // self.down
+        outputs = np.arange(self.produced, end, dtype=np.int64)
+        self.produced = end
+        if len(outputs) == 0:
+            return b""
+        positions = outputs * self.down
+        newest = positions // self.up - first
+        windows = np.lib.stride_tricks.sliding_window_view(signal, self.taps_per_phase)
+        resampled = np.einsum("nk,nk->n", windows[newest - self.taps_per_phase + 1], self.phases[positions % self.up])
+        return np.clip(np.rint(resampled), -32768, 32767).astype(np.int16).tobytes()
@@ -1,115 +1,266 @@
-import whisper
-import torch
-import wave
-import os
+import numpy as np
 import threading
-import tempfile
+import time
 import custom_speech_recognition as sr
-import io
+from LocalAgreement import LocalAgreement
+from Metrics import metrics
+from TranscriptStore import TranscriptStore
+from VoiceActivityDetector import EnergyVAD
 from datetime import timedelta
-import pyaudiowpatch as pyaudio
-from heapq import merge
 
+# only used when no voice activity detector is configured
 PHRASE_TIMEOUT = 3.05
 
-MAX_PHRASES = 10
+TRANSCRIPTION_WORKERS = 2
+
+# hard cap on the audio held for a speaker's current phrase, matching whisper's 30 second window
+MAX_PHRASE_SECONDS = 30
+
+WHISPER_SAMPLE_RATE = 16000
+
+# audio with less than MIN_SPEECH_SECONDS of 30 ms frames at MIN_SPEECH_RMS (about -40 dBFS) never reaches the model
+GATE_FRAME_SECONDS = 0.03
+MIN_SPEECH_RMS = 0.01
+MIN_SPEECH_SECONDS = 0.15
+
+# whisper accepts a mono 16 kHz float32 array directly, which skips the temp file and the ffmpeg decode;
+# the recorders already deliver that format, so the downmix and resample here are only a fallback
+def pcm_to_float32(data, sample_rate, channels):
+    audio = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio[:len(audio) - len(audio) % channels].reshape(-1, channels).mean(axis=1)
+    if sample_rate != WHISPER_SAMPLE_RATE and len(audio) > 0:
+        target_length = int(len(audio) * WHISPER_SAMPLE_RATE / sample_rate)
+        positions = np.arange(target_length) * (sample_rate / WHISPER_SAMPLE_RATE)
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+def loud_seconds(audio):
+    frame_length = int(GATE_FRAME_SECONDS * WHISPER_SAMPLE_RATE)
+    frames = audio[:len(audio) - len(audio) % frame_length].reshape(-1, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    return np.count_nonzero(rms >= MIN_SPEECH_RMS) * GATE_FRAME_SECONDS
+
+def create_phrase_buffer(recorder):
+    frame_width = recorder.SAMPLE_WIDTH * recorder.channels
+    return sr.AudioBuffer(initial_size=5 * recorder.SAMPLE_RATE * frame_width,
+                          max_size=MAX_PHRASE_SECONDS * recorder.SAMPLE_RATE * frame_width,
+                          frame_width=frame_width)
 
 class AudioTranscriber:
-    def __init__(self, mic_source, speaker_source, model):
-        self.transcript_data = {"You": [], "Speaker": []}
-        self.transcript_changed_event = threading.Event()
+    def __init__(self, mic_recorder, speaker_recorder, model, streaming=True, vad_factory=EnergyVAD):
+        self.transcript = TranscriptStore(["You", "Speaker"])
         self.audio_model = model
+        self.audio_queue = None
+        # streaming needs word timings from the model to know which audio is already committed
+        self.streaming = streaming and hasattr(model, "get_timed_words")
         self.audio_sources = {
             "You": {
-                "sample_rate": mic_source.SAMPLE_RATE,
-                "sample_width": mic_source.SAMPLE_WIDTH,
-                "channels": mic_source.channels,
-                "last_sample": bytes(),
+                "sample_rate": mic_recorder.SAMPLE_RATE,
+                "sample_width": mic_recorder.SAMPLE_WIDTH,
+                "channels": mic_recorder.channels,
+                "last_sample": create_phrase_buffer(mic_recorder),
                 "last_spoken": None,
                 "new_phrase": True,
-                "process_data_func": self.process_mic_data
+                "pending_audio": False,
+                "last_trace_id": None,
+                "agreement": LocalAgreement(),
+                "vad": vad_factory(mic_recorder.SAMPLE_RATE, mic_recorder.channels) if vad_factory else None
             },
             "Speaker": {
-                "sample_rate": speaker_source.SAMPLE_RATE,
-                "sample_width": speaker_source.SAMPLE_WIDTH,
-                "channels": speaker_source.channels,
-                "last_sample": bytes(),
+                "sample_rate": speaker_recorder.SAMPLE_RATE,
+                "sample_width": speaker_recorder.SAMPLE_WIDTH,
+                "channels": speaker_recorder.channels,
+                "last_sample": create_phrase_buffer(speaker_recorder),
                 "last_spoken": None,
                 "new_phrase": True,
-                "process_data_func": self.process_speaker_data
+                "pending_audio": False,
+                "last_trace_id": None,
+                "agreement": LocalAgreement(),
+                "vad": vad_factory(speaker_recorder.SAMPLE_RATE, speaker_recorder.channels) if vad_factory else None
             }
         }
 
-    def transcribe_audio_queue(self, audio_queue):
-        while True:
-            who_spoke, data, time_spoken = audio_queue.get()
-            self.update_last_sample_and_phrase_status(who_spoke, data, time_spoken)
-            source_info = self.audio_sources[who_spoke]
+    def start_workers(self, audio_queue, models):
+        self.audio_queue = audio_queue
+        for model in models:
+            worker = threading.Thread(target=self.transcribe_audio_queue, args=(audio_queue, model))
+            worker.daemon = True
+            worker.start()
 
-            text = ''
+    def transcribe_audio_queue(self, audio_queue, model=None):
+        # every worker needs its own model instance; sources are handed out one worker at a time by the queue
+        model = model or self.audio_model
+        while True:
+            chunks = audio_queue.claim()
             try:
-                fd, path = tempfile.mkstemp(suffix=".wav")
-                os.close(fd)
-                source_info["process_data_func"](source_info["last_sample"], path)
-                text = self.audio_model.get_transcription(path)
+                self.transcribe_chunks(model, chunks)
             except Exception as e:
-                print(e)
+                # a failed batch is lost, but the worker has to keep serving the queue
+                print(f"[ERROR] Transcribing audio from {chunks[0][0]} failed: {e}")
             finally:
-                os.unlink(path)
+                audio_queue.release(chunks[0][0])
+
+    def transcribe_chunks(self, model, chunks):
+        if self.audio_sources[chunks[0][0]]["vad"] is not None:
+            self.transcribe_voiced_chunks(model, chunks)
+            return
+
+        # intermediate results of a backlog would be overwritten right away, so only the newest audio
+        # of each phrase is transcribed; a phrase that ends inside the backlog still gets its final pass
+        for index, (who_spoke, data, time_spoken, trace_id) in enumerate(chunks):
+            metrics.mark(trace_id, "dequeue")
+            self.update_last_sample_and_phrase_status(who_spoke, data, time_spoken)
+            source_info = self.audio_sources[who_spoke]
+            if index + 1 < len(chunks) and not self.phrase_timed_out(source_info, chunks[index + 1][2]):
+                metrics.increment("transcriber.skipped_passes")
+                continue
+            self.transcribe_phrase(model, who_spoke, time_spoken, trace_id)
+        metrics.increment("transcriber.chunks", len(chunks))
+
+    def transcribe_voiced_chunks(self, model, chunks):
+        # only voiced audio reaches the phrase buffer, and a phrase ends where the detector hears speech stop,
+        # so silence costs no model time and phrases are not cut at a fixed wall-clock gap
+        who_spoke = chunks[0][0]
+        source_info = self.audio_sources[who_spoke]
+        voiced_chunks, passes = 0, 0
+        for _, data, time_spoken, trace_id in chunks:
+            metrics.mark(trace_id, "dequeue")
+            segments = source_info["vad"].split(data)
+            if any(voiced for voiced, _ in segments):
+                voiced_chunks += 1
+            else:
+                metrics.increment("transcriber.silent_chunks")
+            for voiced, ended in segments:
+                if voiced:
+                    source_info["last_sample"].extend(voiced)
+                    source_info["last_spoken"] = time_spoken
+                    source_info["last_trace_id"] = trace_id
+                    source_info["pending_audio"] = True
+                if ended:
+                    if source_info["pending_audio"]:
+                        self.transcribe_phrase(model, who_spoke, time_spoken, trace_id)
+                        passes += 1
+                    self.start_new_phrase(source_info)
+        if source_info["pending_audio"]:
+            self.transcribe_phrase(model, who_spoke, source_info["last_spoken"], source_info["last_trace_id"])
+            passes += 1
+        metrics.increment("transcriber.skipped_passes", max(0, voiced_chunks - passes))
+        metrics.increment("transcriber.chunks", len(chunks))
+
+    def transcribe_phrase(self, model, who_spoke, time_spoken, trace_id):
+        source_info = self.audio_sources[who_spoke]
+        source_info["pending_audio"] = False
+        metrics.increment("transcriber.inferences")
+
+        text = ''
+        try:
+            if self.streaming:
+                text = self.transcribe_uncommitted_tail(model, source_info, trace_id)
+            else:
+                audio = self.process_data(source_info, source_info["last_sample"].view())
+                metrics.mark(trace_id, "encode")
+                if self.passes_speech_gate(audio):
+                    text = self.run_model(model.get_transcription, audio)
+                metrics.mark(trace_id, "inference")
+        except Exception as e:
+            print(e)
 
-            if text != '' and text.lower() != 'you':
-                self.update_transcript(who_spoke, text, time_spoken)
-                self.transcript_changed_event.set()
+        # the models already drop what whisper itself rates as probably not speech
+        if text != '':
+            self.update_transcript(who_spoke, text, time_spoken, trace_id)
+            metrics.mark(trace_id, "transcript_update")
+
+    def passes_speech_gate(self, audio):
+        # room noise and clicks are skipped before the model, where whisper would make up words for them
+        if loud_seconds(audio) >= MIN_SPEECH_SECONDS:
+            return True
+        duration = len(audio) / WHISPER_SAMPLE_RATE
+        metrics.increment("transcriber.gated_passes")
+        metrics.increment("transcriber.gated_audio_seconds", duration)
+        processed = metrics.counter("transcriber.inference_audio_seconds")
+        if processed:
+            metrics.increment("transcriber.inference_seconds_saved",
+                              duration * metrics.counter("transcriber.inference_seconds") / processed)
+        return False
+
+    def run_model(self, transcribe, audio, **kwargs):
+        start = time.monotonic()
+        result = transcribe(audio, **kwargs)
+        metrics.increment("transcriber.inference_seconds", time.monotonic() - start)
+        metrics.increment("transcriber.inference_audio_seconds", len(audio) / WHISPER_SAMPLE_RATE)
+        return result
+
+    def phrase_timed_out(self, source_info, time_spoken):
+        return source_info["last_spoken"] and time_spoken - source_info["last_spoken"] > timedelta(seconds=PHRASE_TIMEOUT)
 
     def update_last_sample_and_phrase_status(self, who_spoke, data, time_spoken):
         source_info = self.audio_sources[who_spoke]
-        if source_info["last_spoken"] and time_spoken - source_info["last_spoken"] > timedelta(seconds=PHRASE_TIMEOUT):
-            source_info["last_sample"] = bytes()
-            source_info["new_phrase"] = True
-        else:
-            source_info["new_phrase"] = False
+        # new_phrase stays set until the phrase reaches the transcript, even across skipped passes
+        if self.phrase_timed_out(source_info, time_spoken):
+            self.start_new_phrase(source_info)
 
-        source_info["last_sample"] += data
+        source_info["last_sample"].extend(data)
         source_info["last_spoken"] = time_spoken 
 
-    def process_mic_data(self, data, temp_file_name):
-        audio_data = sr.AudioData(data, self.audio_sources["You"]["sample_rate"], self.audio_sources["You"]["sample_width"])
-        wav_data = io.BytesIO(audio_data.get_wav_data())
-        with open(temp_file_name, 'w+b') as f:
-            f.write(wav_data.read())
-
-    def process_speaker_data(self, data, temp_file_name):
-        with wave.open(temp_file_name, 'wb') as wf:
-            wf.setnchannels(self.audio_sources["Speaker"]["channels"])
-            p = pyaudio.PyAudio()
-            wf.setsampwidth(p.get_sample_size(pyaudio.paInt16))
-            wf.setframerate(self.audio_sources["Speaker"]["sample_rate"])
-            wf.writeframes(data)
-
-    def update_transcript(self, who_spoke, text, time_spoken):
-        source_info = self.audio_sources[who_spoke]
-        transcript = self.transcript_data[who_spoke]
+    def start_new_phrase(self, source_info):
+        # a phrase that reached the transcript is finished now, which is when the responder should answer
+        if not source_info["new_phrase"]:
+            self.transcript.complete_phrase()
+        source_info["last_sample"].clear()
+        source_info["agreement"].reset()
+        source_info["new_phrase"] = True
+        source_info["pending_audio"] = False
 
-        if source_info["new_phrase"] or len(transcript) == 0:
-            if len(transcript) > MAX_PHRASES:
-                transcript.pop(-1)
-            transcript.insert(0, (f"{who_spoke}: [{text}]\n\n", time_spoken))
-        else:
-            transcript[0] = (f"{who_spoke}: [{text}]\n\n", time_spoken)
+    def transcribe_uncommitted_tail(self, model, source_info, trace_id):
+        agreement = source_info["agreement"]
+        phrase = source_info["last_sample"]
+        frame_width = source_info["sample_width"] * source_info["channels"]
+        bytes_per_second = source_info["sample_rate"] * frame_width
+        window_start = agreement.window_start()
+        offset = max(0, int(window_start * source_info["sample_rate"]) * frame_width - phrase.discarded)
+        window_start = (phrase.discarded + offset) / bytes_per_second
+
+        audio = self.process_data(source_info, phrase.view(offset))
+        metrics.mark(trace_id, "encode")
+        if not self.passes_speech_gate(audio):
+            return ''
+        words = self.run_model(model.get_timed_words, audio, prompt=agreement.prompt())
+        metrics.mark(trace_id, "inference")
+        phrase_duration = (phrase.discarded + len(phrase)) / bytes_per_second
+        agreement.insert(words, window_start, phrase_duration)
+
+        # committed audio is never decoded again, so it does not need to be held
+        committed_offset = int(agreement.window_start() * source_info["sample_rate"]) * frame_width
+        phrase.discard_front(committed_offset - phrase.discarded)
+        return agreement.text()
+
+    def process_data(self, source_info, data):
+        return pcm_to_float32(data, source_info["sample_rate"], source_info["channels"])
+
+    def update_transcript(self, who_spoke, text, time_spoken, trace_id=None):
+        source_info = self.audio_sources[who_spoke]
+        self.transcript.update(who_spoke, text, time_spoken, source_info["new_phrase"], trace_id)
+        source_info["new_phrase"] = False
 
     def get_transcript(self):
-        combined_transcript = list(merge(
-            self.transcript_data["You"], self.transcript_data["Speaker"], 
-            key=lambda x: x[1], reverse=True))
-        combined_transcript = combined_transcript[:MAX_PHRASES]
-        return "".join([t[0] for t in combined_transcript])
+        return self.transcript.get_snapshot().text
+
+    def get_transcript_snapshot(self):
+        return self.transcript.get_snapshot()
     
     def clear_transcript_data(self):
-        self.transcript_data["You"].clear()
-        self.transcript_data["Speaker"].clear()
+        self.transcript.clear()
 
-        self.audio_sources["You"]["last_sample"] = bytes()
-        self.audio_sources["Speaker"]["last_sample"] = bytes()
+        for who_spoke in self.audio_sources:
+            if self.audio_queue is None:
+                self.reset_source(who_spoke)
+            else:
+                # a worker may be in the middle of this source; the reset then waits for its release
+                self.audio_queue.run_claimed(who_spoke, lambda who_spoke=who_spoke: self.reset_source(who_spoke))
 
-        self.audio_sources["You"]["new_phrase"] = True
-        self.audio_sources["Speaker"]["new_phrase"] = True
\ No newline at end of file
+    def reset_source(self, who_spoke):
+        source_info = self.audio_sources[who_spoke]
+        self.start_new_phrase(source_info)
+        if source_info["vad"] is not None:
+            source_info["vad"].reset()
@@ -0,0 +1,83 @@
+import queue
+import threading
+import time
+import torch
+import whisper
+from concurrent.futures import Future
+
+MAX_BATCH_SIZE = 8
+MAX_WAIT_MS = 5
+
+# whisper timestamp tokens are 20 ms apart
+SECONDS_PER_TIMESTAMP = 0.02
+
+class BatchedWhisperEngine:
+    """
+    Runs whisper on segments from several callers in one batch.
+
+    ``submit`` queues a mono 16 kHz float32 array and returns a ``Future``. A single inference thread
+    takes the first pending segment, waits up to ``max_wait_ms`` for others to arrive, pads every segment
+    to whisper's 30 second window and runs the encoder and decoder once for up to ``max_batch_size``
+    segments. Each future is resolved with its own ``whisper.DecodingResult``.
+
+    Decoding options are shared by the whole batch, so per-caller prompts are not supported.
+    """
+    def __init__(self, model, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, language="en"):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # an int8 model always runs on the CPU, where fp16 is not supported
+        self.options = whisper.DecodingOptions(language=language, without_timestamps=False, fp16=model.device.type == "cuda")
+        self.tokenizer = whisper.tokenizer.get_tokenizer(model.is_multilingual, language=language, task=self.options.task)
+        self.requests = queue.Queue()
+
+        worker = threading.Thread(target=self.run)
+        worker.daemon = True
+        worker.start()
+
+    def submit(self, audio):
+        future = Future()
+        self.requests.put((audio, future))
+        return future
+
+    def run(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.decode_batch(batch)
+
+    def decode_batch(self, batch):
+        try:
+            mel = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(audio)) for audio, _ in batch])
+            results = whisper.decode(self.model, mel.to(self.model.device), self.options)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def timed_segments(self, result):
+        # tokens look like <|0.00|> text <|2.40|><|2.40|> text <|5.00|>
+        segments, start, text_tokens = [], None, []
+        for token in result.tokens:
+            if token < self.tokenizer.timestamp_begin:
+                text_tokens.append(token)
+                continue
+            timestamp = (token - self.tokenizer.timestamp_begin) * SECONDS_PER_TIMESTAMP
+            if start is not None and text_tokens:
+                segments.append((start, timestamp, self.tokenizer.decode(text_tokens)))
+                start, text_tokens = None, []
+            else:
+                start = timestamp
+        if start is not None and text_tokens:
+            segments.append((start, start, self.tokenizer.decode(text_tokens)))
+        return segments
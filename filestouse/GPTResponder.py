@@ -1,51 +1,180 @@
 import openai
-from keys import OPENAI_API_KEY
+import os
+try:
+    from keys import OPENAI_API_KEY
+except ImportError:
+    OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 from prompts import create_prompt, INITIAL_RESPONSE
+from Metrics import metrics
+from ResponseCache import ResponseCache, normalize_transcript
+import threading
 import time
 
 openai.api_key = OPENAI_API_KEY
 
-def generate_response_from_transcript(transcript):
+# changes that arrive this close together, like both speakers finishing at once, get a single response
+DEBOUNCE_SECONDS = 0.3
+
+class BracketParser:
+    """
+    Extracts the answer between the first ``[`` and the next ``]`` from a response that arrives in pieces.
+
+    ``answer`` holds what has been seen of the answer so far, and ``closed`` is set once its ``]`` arrives.
+    """
+    def __init__(self):
+        self.opened = False
+        self.closed = False
+        self.answer = ''
+
+    def feed(self, text):
+        if self.closed:
+            return
+        if not self.opened:
+            if '[' not in text:
+                return
+            self.opened = True
+            text = text.split('[', 1)[1]
+        if ']' in text:
+            text = text.split(']', 1)[0]
+            self.closed = True
+        self.answer += text
+
+def generate_response_from_transcript(segments, cancelled=None, on_partial=None):
+    # streamed, so the answer can be shown as it arrives and a request that newer transcript text has
+    # superseded stops as soon as it is noticed
+    parser = BracketParser()
     try:
         response = openai.ChatCompletion.create(
                 model="gpt-3.5-turbo-0301",
-                messages=[{"role": "system", "content": create_prompt(transcript)}],
-                temperature = 0.0
+                messages=[{"role": "system", "content": create_prompt(segments)}],
+                temperature = 0.0,
+                stream=True
         )
+        for chunk in response:
+            if cancelled is not None and cancelled():
+                response.close()
+                return None
+            answer = parser.answer
+            parser.feed(chunk.choices[0].delta.get("content", ""))
+            if on_partial is not None and parser.answer != answer:
+                on_partial(parser.answer)
+            if parser.closed:
+                # nothing after the closing bracket is shown, so there is no need to wait for it
+                response.close()
+                break
     except Exception as e:
         print(e)
         return ''
-    full_response = response.choices[0].message.content
-    try:
-        return full_response.split('[')[1].split(']')[0]
-    except:
-        return ''
-    
+    return parser.answer
+
 class GPTResponder:
+    """
+    Answers the transcript whenever it settles, without polling.
+
+    The scheduler thread blocks on the transcript store. After the first unanswered change it keeps
+    collecting changes until a phrase completes (plus ``DEBOUNCE_SECONDS`` for the burst to settle) or
+    ``response_interval`` seconds have passed, then starts a request for the latest snapshot. Each
+    request runs in its own thread and updates ``response`` as the answer streams in; starting a new
+    one supersedes any still in flight, which stops reading its stream and never overwrites the newer
+    response.
+
+    Transcripts that normalize to one already answered (or being answered) are served from the
+    ``ResponseCache`` (or left to the request in flight) without another API round-trip.
+    """
     def __init__(self):
         self.response = INITIAL_RESPONSE
+        # bumped on every change of response, so the UI can tell whether it has to redraw
+        self.version = 0
+        # latency trace of the transcript change behind the current response
+        self.response_trace_id = None
         self.response_interval = 2
+        self.generation = 0
+        self.in_flight = 0
+        self.scheduled_version = 0
+        self.lock = threading.Condition()
+        self.cache = ResponseCache()
+        self.requested_key = None
 
     def respond_to_transcriber(self, transcriber):
+        store = transcriber.transcript
+        answered = store.get_snapshot()
+        self.scheduled_version = answered.version
+        while True:
+            snapshot = self.wait_for_trigger(store, store.wait_for_change(answered.version), answered)
+            answered = snapshot
+            self.scheduled_version = snapshot.version
+            if snapshot.text != '':
+                self.start_request(snapshot)
+
+    def wait_for_trigger(self, store, snapshot, answered):
+        deadline = time.monotonic() + self.response_interval
         while True:
-            if transcriber.transcript_changed_event.is_set():
-                start_time = time.time()
-
-                transcriber.transcript_changed_event.clear() 
-                transcript_string = transcriber.get_transcript()
-                response = generate_response_from_transcript(transcript_string)
-                
-                end_time = time.time()  # Measure end time
-                execution_time = end_time - start_time  # Calculate the time it took to execute the function
-                
+            timeout = deadline - time.monotonic()
+            if snapshot.completed > answered.completed:
+                timeout = min(timeout, DEBOUNCE_SECONDS)
+            if timeout <= 0:
+                return snapshot
+            newer = store.wait_for_change(snapshot.version, timeout)
+            if newer is None:
+                return snapshot
+            snapshot = newer
+
+    def start_request(self, snapshot):
+        key = normalize_transcript(snapshot.text)
+        with self.lock:
+            if key == self.requested_key and self.in_flight > 0:
+                return
+            cached = self.cache.get(key)
+            # a cached answer supersedes any request in flight just like a new request would
+            self.generation += 1
+            self.requested_key = key
+            if cached is not None:
+                self.set_response(snapshot, cached)
+                return
+            self.in_flight += 1
+            generation = self.generation
+        request = threading.Thread(target=self.request_response, args=(snapshot, generation, key))
+        request.daemon = True
+        request.start()
+
+    def request_response(self, snapshot, generation, key):
+        start = time.monotonic()
+        try:
+            metrics.mark(snapshot.trace_id, "llm_request_start")
+            response = generate_response_from_transcript(snapshot.segments, cancelled=lambda: generation != self.generation,
+                                                         on_partial=lambda answer: self.show_partial(snapshot, generation, answer))
+            with self.lock:
+                if response is None or generation != self.generation:
+                    metrics.increment("responder.superseded")
+                    return
+                metrics.mark(snapshot.trace_id, "llm_request_end")
                 if response != '':
-                    self.response = response
+                    self.set_response(snapshot, response)
+                    self.cache.put(key, response, time.monotonic() - start)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def show_partial(self, snapshot, generation, answer):
+        with self.lock:
+            if generation != self.generation or answer.strip() == '':
+                return
+            metrics.mark(snapshot.trace_id, "llm_first_word")
+            self.set_response(snapshot, answer)
+
+    def set_response(self, snapshot, response):
+        # called with the lock held
+        self.response_trace_id = snapshot.trace_id
+        self.response = response
+        self.version += 1
+        self.lock.notify_all()
 
-                remaining_time = self.response_interval - execution_time
-                if remaining_time > 0:
-                    time.sleep(remaining_time)
-            else:
-                time.sleep(0.3)
+    def wait_for_response(self, version, timeout=None):
+        # returns (version, response) once the response is newer than version, or None after timeout seconds
+        with self.lock:
+            if self.lock.wait_for(lambda: self.version != version, timeout):
+                return self.version, self.response
+            return None
 
     def update_response_interval(self, interval):
-        self.response_interval = interval
\ No newline at end of file
+        self.response_interval = interval
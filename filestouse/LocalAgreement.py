@@ -0,0 +1,67 @@
+import string
+
+OVERLAP_SECONDS = 0.5
+MAX_UNCOMMITTED_SECONDS = 15
+PROMPT_CHARACTERS = 200
+MAX_NGRAM_OVERLAP = 5
+
+def normalize_word(word):
+    return word.strip().strip(string.punctuation).lower()
+
+class LocalAgreement:
+    """
+    Commits the prefix of a growing phrase once two consecutive decodes agree on it (LocalAgreement-2).
+
+    Words are ``(start, end, text)`` tuples, with times in seconds from the start of the phrase. Only
+    the audio after the last committed word, plus ``OVERLAP_SECONDS`` of context, has to be decoded again.
+    """
+    def __init__(self, overlap=OVERLAP_SECONDS, max_uncommitted=MAX_UNCOMMITTED_SECONDS):
+        self.overlap = overlap
+        self.max_uncommitted = max_uncommitted
+        self.reset()
+
+    def reset(self):
+        self.committed = []
+        self.tentative = []
+
+    def committed_until(self):
+        return self.committed[-1][1] if self.committed else 0.0
+
+    def window_start(self):
+        return max(0.0, self.committed_until() - self.overlap)
+
+    def prompt(self):
+        return "".join(word for _, _, word in self.committed)[-PROMPT_CHARACTERS:]
+
+    def insert(self, words, window_start, audio_duration):
+        committed_until = self.committed_until()
+        words = [(start + window_start, end + window_start, word) for start, end, word in words]
+        # the overlap window makes the model repeat words that are already committed
+        words = [w for w in words if w[0] > committed_until - 0.1]
+        words = self.drop_committed_ngram(words)
+
+        agreed = 0
+        for new, old in zip(words, self.tentative):
+            if normalize_word(new[2]) != normalize_word(old[2]):
+                break
+            agreed += 1
+        self.committed.extend(words[:agreed])
+        self.tentative = words[agreed:]
+
+        # a hypothesis that never stabilizes would let the decode window grow without bound
+        if self.tentative and audio_duration - self.committed_until() > self.max_uncommitted:
+            self.committed.extend(self.tentative)
+            self.tentative = []
+
+    def drop_committed_ngram(self, words):
+        if not self.committed or not words:
+            return words
+        for n in range(min(MAX_NGRAM_OVERLAP, len(self.committed), len(words)), 0, -1):
+            tail = [normalize_word(w[2]) for w in self.committed[-n:]]
+            head = [normalize_word(w[2]) for w in words[:n]]
+            if tail == head:
+                return words[n:]
+        return words
+
+    def text(self):
+        return "".join(word for _, _, word in self.committed + self.tentative).strip()
@@ -0,0 +1,117 @@
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict, deque, OrderedDict
+
+# upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+HISTOGRAM_SAMPLES = 2048
+MAX_OPEN_TRACES = 1000
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.samples = deque(maxlen=HISTOGRAM_SAMPLES)
+
+    def observe(self, value):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+        self.samples.append(value)
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": self.maximum,
+            "buckets": {("+inf" if i == len(self.buckets) else str(self.buckets[i])): count
+                        for i, count in enumerate(self.counts)},
+        }
+
+class Metrics:
+    """
+    Counters, gauges and latency histograms shared by the whole pipeline.
+
+    Every captured chunk starts a trace; later stages ``mark`` the trace as it passes through them. Each
+    mark records, in milliseconds, the time since the previous stage of the same trace (``stage.<name>``)
+    and since capture (``since_capture.<name>``). A stage is only recorded the first time a trace reaches it.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self.histograms = defaultdict(Histogram)
+        self.traces = OrderedDict()
+        self.trace_ids = itertools.count(1)
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def counter(self, name):
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def observe(self, name, value):
+        with self.lock:
+            self.histograms[name].observe(value)
+
+    def start_trace(self, stage="capture"):
+        with self.lock:
+            trace_id = next(self.trace_ids)
+            self.traces[trace_id] = [(stage, time.monotonic())]
+            while len(self.traces) > MAX_OPEN_TRACES:
+                self.traces.popitem(last=False)
+        return trace_id
+
+    def mark(self, trace_id, stage):
+        now = time.monotonic()
+        with self.lock:
+            marks = self.traces.get(trace_id)
+            if marks is None or any(name == stage for name, _ in marks):
+                return
+            self.histograms[f"stage.{stage}"].observe((now - marks[-1][1]) * 1000)
+            self.histograms[f"since_capture.{stage}"].observe((now - marks[0][1]) * 1000)
+            marks.append((stage, now))
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            }
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2, sort_keys=True)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.traces.clear()
+
+# shared by the recorders, the queue, the transcriber and the responder
+metrics = Metrics()
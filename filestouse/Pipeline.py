@@ -0,0 +1,77 @@
+import threading
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from Metrics import metrics
+
+# torch, whisper, openai and the audio device libraries are imported by start_pipeline, so a front end can
+# show itself before they are loaded
+
+@contextmanager
+def timed_phase(name):
+    start = time.monotonic()
+    yield
+    elapsed = time.monotonic() - start
+    metrics.set_gauge(f"startup.{name.replace(' ', '_')}_seconds", elapsed)
+    print(f"[INFO] Startup: {name} took {elapsed:.2f}s")
+
+def start_recorder(recorder_class, name, audio_queue):
+    with timed_phase(f"{name} calibration"):
+        recorder = recorder_class()
+        recorder.calibrate()
+    recorder.record_into_queue(audio_queue)
+    return recorder
+
+def argument_value(name, default):
+    # the value that follows a "--name value" command line option
+    if name in sys.argv[:-1]:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+def load_models():
+    with timed_phase("model imports"):
+        import TranscriberModels
+        from AudioTranscriber import TRANSCRIPTION_WORKERS
+    with timed_phase("model load"):
+        return TranscriberModels.get_models('--api' in sys.argv, TRANSCRIPTION_WORKERS, batched='--batch' in sys.argv,
+                                            quantized='--int8' in sys.argv, processes='--processes' in sys.argv)
+
+def create_pipeline():
+    return {"started": time.monotonic(), "audio_queue": None, "transcriber": None, "responder": None, "error": None}
+
+def start_pipeline(pipeline):
+    # the model load and both calibrations wait on different things (disk and CPU, the mic, the speaker),
+    # so they run side by side; audio captured before the model is ready waits in the queue
+    try:
+        with timed_phase("audio imports"):
+            import AudioRecorder
+            from AudioQueue import SourceAudioQueue, MAX_QUEUED_CHUNKS, MERGE
+            from AudioTranscriber import AudioTranscriber
+        audio_queue = SourceAudioQueue(["You", "Speaker"], policy=argument_value('--queue-policy', MERGE),
+                                       max_chunks=int(argument_value('--max-queued-chunks', MAX_QUEUED_CHUNKS)))
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            models = executor.submit(load_models)
+            user_audio_recorder = executor.submit(start_recorder, AudioRecorder.DefaultMicRecorder, "mic", audio_queue)
+            speaker_audio_recorder = executor.submit(start_recorder, AudioRecorder.DefaultSpeakerRecorder, "speaker", audio_queue)
+            models, user_audio_recorder, speaker_audio_recorder = models.result(), user_audio_recorder.result(), speaker_audio_recorder.result()
+
+        transcriber = AudioTranscriber(user_audio_recorder, speaker_audio_recorder, models[0])
+        transcriber.start_workers(audio_queue, models)
+
+        from GPTResponder import GPTResponder
+        responder = GPTResponder()
+        respond = threading.Thread(target=responder.respond_to_transcriber, args=(transcriber,))
+        respond.daemon = True
+        respond.start()
+    except Exception as e:
+        print(f"[ERROR] Startup failed: {e}")
+        # a front end shows this instead of waiting for a transcriber that never comes
+        pipeline["error"] = str(e) or type(e).__name__
+        return
+
+    pipeline.update(audio_queue=audio_queue, transcriber=transcriber, responder=responder)
+    elapsed = time.monotonic() - pipeline["started"]
+    metrics.set_gauge("startup.ready_seconds", elapsed)
+    print(f"[INFO] Startup: ready after {elapsed:.2f}s")
+    print("READY")
@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+from LocalAgreement import normalize_word
+from Metrics import metrics
+
+MAX_ENTRIES = 128
+TTL_SECONDS = 300
+
+def normalize_transcript(text):
+    # case, punctuation and spacing differences between two transcriptions of the same words do not
+    # change what the conversation says, so they map to the same key
+    return " ".join(word for word in map(normalize_word, text.split()) if word)
+
+class ResponseCache:
+    """
+    Remembers responses by the normalized transcript they answered, with LRU eviction and a TTL.
+
+    ``get`` counts hits and misses in ``responder.cache_hits`` and ``responder.cache_misses``, keeps
+    ``responder.cache_hit_rate`` up to date and adds the time the original request took to
+    ``responder.cache_seconds_saved`` for every hit.
+    """
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                metrics.increment("responder.cache_misses")
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                metrics.increment("responder.cache_hits")
+                metrics.increment("responder.cache_seconds_saved", entry[1])
+            metrics.set_gauge("responder.cache_hit_rate", self.hits / (self.hits + self.misses))
+            return entry[0] if entry is not None else None
+
+    def put(self, key, response, latency):
+        with self.lock:
+            self.entries[key] = (response, latency, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
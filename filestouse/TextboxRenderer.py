@@ -0,0 +1,49 @@
+from difflib import SequenceMatcher
+
+def tk_length(text):
+    # Tk counts a character outside the Basic Multilingual Plane, like an emoji, as two
+    return len(text.encode("utf-16-le")) // 2
+
+class TextboxRenderer:
+    """
+    Keeps a textbox in sync with a versioned list of text pieces, editing only what changed.
+
+    ``render`` does nothing when the version is the one already shown. Otherwise it diffs the new pieces
+    against the shown ones and deletes and inserts only the pieces that differ; a piece that only grew,
+    like a phrase being transcribed or a response streaming in, just gets its new end appended. Tk then
+    re-wraps a few lines instead of the whole widget, so the cost does not grow with the session.
+    """
+    def __init__(self, textbox, readonly=False):
+        self.textbox = textbox
+        self.readonly = readonly
+        self.version = None
+        self.pieces = []
+
+    def render(self, version, pieces):
+        if version == self.version:
+            return False
+        pieces = list(pieces)
+        if self.readonly:
+            self.textbox.configure(state="normal")
+        # applied back to front, so the offsets of the earlier pieces stay valid
+        opcodes = SequenceMatcher(a=self.pieces, b=pieces, autojunk=False).get_opcodes()
+        for tag, i1, i2, j1, j2 in reversed(opcodes):
+            if tag == "equal":
+                continue
+            start = sum(tk_length(piece) for piece in self.pieces[:i1])
+            if tag == "replace" and i2 - i1 == 1 and j2 - j1 == 1 and pieces[j1].startswith(self.pieces[i1]):
+                self.insert(start + tk_length(self.pieces[i1]), pieces[j1][len(self.pieces[i1]):])
+                continue
+            end = start + sum(tk_length(piece) for piece in self.pieces[i1:i2])
+            if end > start:
+                self.textbox.delete(f"1.0 + {start} chars", f"1.0 + {end} chars")
+            self.insert(start, "".join(pieces[j1:j2]))
+        if self.readonly:
+            self.textbox.configure(state="disabled")
+        self.version = version
+        self.pieces = pieces
+        return True
+
+    def insert(self, offset, text):
+        if text:
+            self.textbox.insert(f"1.0 + {offset} chars", text)
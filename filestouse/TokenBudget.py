@@ -0,0 +1,47 @@
+from functools import lru_cache
+
+ENCODING_NAME = "cl100k_base"
+# rough size of an English token, used when tiktoken is not installed
+CHARACTERS_PER_TOKEN = 4
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    # building the encoder reads and parses its vocabulary, so it is done once per process
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding(ENCODING_NAME)
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding is None:
+        return (len(text) + CHARACTERS_PER_TOKEN - 1) // CHARACTERS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text, budget):
+    # keeps the end of the text, which is the most recent part of a phrase
+    encoding = get_encoding()
+    if encoding is None:
+        return text[len(text) - budget * CHARACTERS_PER_TOKEN:] if budget > 0 else ''
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[len(tokens) - budget:]) if budget > 0 else ''
+
+def fit_newest_first(pieces, budget):
+    """
+    Returns the longest run of ``pieces`` (given newest first) whose tokens fit in ``budget``.
+
+    Counts are cached per piece, so the phrases that stay in the window between two prompts are not
+    tokenized again. If even the newest piece is too long, its end is kept.
+    """
+    fitted, used = [], 0
+    for piece in pieces:
+        tokens = count_tokens(piece)
+        if used + tokens > budget:
+            if not fitted:
+                fitted.append(truncate_to_tokens(piece, budget))
+            break
+        fitted.append(piece)
+        used += tokens
+    return fitted
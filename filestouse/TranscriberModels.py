@@ -1,33 +1,141 @@
 import openai
 import whisper
 import os
+import io
+import wave
+import numpy as np
 import torch
+from functools import partial
+from BatchingEngine import BatchedWhisperEngine
+from TranscriptionPool import TranscriptionPool
+from Metrics import metrics
 
-def get_model(use_api):
+MODEL_PATH = os.path.join(os.getcwd(), 'tiny.en.pt')
+
+# whisper only skips a window when no_speech_prob > 0.6 and avg_logprob < -1.0, which lets confident
+# hallucinations on silence like "you" through; requiring more confidence from likely non-speech drops them
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -0.5
+
+def is_speech(no_speech_prob, avg_logprob):
+    if no_speech_prob > NO_SPEECH_THRESHOLD and avg_logprob < LOGPROB_THRESHOLD:
+        metrics.increment("model.no_speech_segments")
+        return False
+    return True
+
+def speech_segments(segments):
+    return [segment for segment in segments if is_speech(segment['no_speech_prob'], segment['avg_logprob'])]
+
+def get_model(use_api, quantized=False):
     if use_api:
         return APIWhisperTranscriber()
+    elif quantized:
+        return QuantizedWhisperTranscriber()
     else:
         return WhisperTranscriber()
 
+def get_models(use_api, count, batched=False, quantized=False, processes=False):
+    # a process pool runs one model per worker process, outside this process's GIL
+    if processes and not use_api:
+        return [TranscriptionPool(partial(get_model, False, quantized), workers=count)] * count
+    # a batching engine is thread-safe, so all workers share one model instead of loading one each
+    if batched and not use_api:
+        engine = BatchedWhisperEngine(get_model(use_api, quantized).audio_model)
+        return [BatchedWhisperTranscriber(engine)] * count
+    return [get_model(use_api, quantized) for _ in range(count)]
+
 class WhisperTranscriber:
     def __init__(self):
-        self.audio_model = whisper.load_model(os.path.join(os.getcwd(), 'tiny.en.pt'))
+        self.audio_model = whisper.load_model(MODEL_PATH)
+        self.fp16 = torch.cuda.is_available()
         print(f"[INFO] Whisper using GPU: " + str(torch.cuda.is_available()))
 
-    def get_transcription(self, wav_file_path):
+    def get_transcription(self, audio):
         try:
-            result = self.audio_model.transcribe(wav_file_path, fp16=torch.cuda.is_available())
+            result = self.audio_model.transcribe(audio, fp16=self.fp16)
         except Exception as e:
             print(e)
             return ''
-        return result['text'].strip()
+        return "".join(segment['text'] for segment in speech_segments(result['segments'])).strip()
+
+    def get_timed_words(self, audio, prompt=''):
+        try:
+            result = self.audio_model.transcribe(audio, fp16=self.fp16, word_timestamps=True,
+                                                 initial_prompt=prompt or None, condition_on_previous_text=False)
+        except Exception as e:
+            print(e)
+            return []
+        return [(word['start'], word['end'], word['word']) for segment in speech_segments(result['segments'])
+                for word in segment.get('words', [])]
     
+class QuantizedWhisperTranscriber(WhisperTranscriber):
+    """
+    Runs the local whisper model on the CPU with int8 weights in every linear layer.
+
+    The attention and MLP projections hold nearly all of whisper's weights and time, so torch dynamic
+    quantization of just those layers cuts the model to about a quarter of its size and speeds up CPU
+    inference, while the convolutions, embeddings and layer norms stay in float32.
+    """
+    def __init__(self, model_path=MODEL_PATH):
+        model = whisper.load_model(model_path, device="cpu")
+        # whisper subclasses nn.Linear only to cast weights under fp16; quantize_dynamic swaps exact types
+        for module in model.modules():
+            if isinstance(module, whisper.model.Linear):
+                module.__class__ = torch.nn.Linear
+        self.audio_model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.fp16 = False
+        print(f"[INFO] Whisper using int8 weights on the CPU")
+
+class BatchedWhisperTranscriber:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def get_transcription(self, audio):
+        try:
+            result = self.engine.submit(audio).result()
+        except Exception as e:
+            print(e)
+            return ''
+        if not is_speech(result.no_speech_prob, result.avg_logprob):
+            return ''
+        return result.text.strip()
+
+    def get_timed_words(self, audio, prompt=''):
+        # prompts cannot differ within a batch, so segments are decoded without one
+        try:
+            result = self.engine.submit(audio).result()
+        except Exception as e:
+            print(e)
+            return []
+        if not is_speech(result.no_speech_prob, result.avg_logprob):
+            return []
+        return self.engine.timed_segments(result)
+
 class APIWhisperTranscriber:
-    def get_transcription(self, wav_file_path):
+    def get_transcription(self, audio):
         try:
-            with open(wav_file_path, "rb") as audio_file:
-                result = openai.Audio.transcribe("whisper-1", audio_file)
+            result = openai.Audio.transcribe("whisper-1", to_wav_file(audio), response_format="verbose_json")
         except Exception as e:
             print(e)
             return ''
-        return result['text'].strip()
\ No newline at end of file
+        return "".join(segment['text'] for segment in speech_segments(result['segments'])).strip()
+
+    def get_timed_words(self, audio, prompt=''):
+        # the API only reports segment timings, so segments are the unit of agreement
+        try:
+            result = openai.Audio.transcribe("whisper-1", to_wav_file(audio), prompt=prompt, response_format="verbose_json")
+        except Exception as e:
+            print(e)
+            return []
+        return [(segment['start'], segment['end'], ' ' + segment['text'].strip()) for segment in speech_segments(result['segments'])]
+
+def to_wav_file(audio):
+    wav_file = io.BytesIO()
+    with wave.open(wav_file, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(whisper.audio.SAMPLE_RATE)
+        wf.writeframes((np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes())
+    wav_file.seek(0)
+    wav_file.name = "audio.wav"  # the openai client infers the upload format from the file name
+    return wav_file
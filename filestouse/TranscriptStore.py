@@ -0,0 +1,68 @@
+import threading
+from collections import namedtuple
+from heapq import merge
+
+MAX_PHRASES = 10
+
+# segments are (who_spoke, text, time_spoken) tuples, newest first; trace_id is the latency trace of the
+# audio chunk behind the latest change; completed counts the phrases that have ended so far
+TranscriptSnapshot = namedtuple("TranscriptSnapshot", ["version", "segments", "text", "trace_id", "completed"])
+
+def format_segment(who_spoke, text):
+    return f"{who_spoke}: [{text}]\n\n"
+
+class TranscriptStore:
+    """
+    Keeps the latest phrases of every speaker and publishes them as an immutable ``TranscriptSnapshot``.
+
+    Writers rebuild the snapshot once per change, under a lock, and bump its version. Readers just take
+    the current ``snapshot`` reference, so getting the transcript is O(1) and never sees a half-updated
+    list; comparing versions tells them whether anything changed since they last looked, and
+    ``wait_for_change`` blocks until it does.
+    """
+    def __init__(self, speakers, max_phrases=MAX_PHRASES):
+        self.max_phrases = max_phrases
+        self.phrases = {speaker: [] for speaker in speakers}
+        self.lock = threading.Condition()
+        self.snapshot = TranscriptSnapshot(0, (), "", None, 0)
+
+    def update(self, who_spoke, text, time_spoken, new_phrase, trace_id=None):
+        with self.lock:
+            phrases = self.phrases[who_spoke]
+            if new_phrase or len(phrases) == 0:
+                if len(phrases) > self.max_phrases:
+                    phrases.pop(-1)
+                phrases.insert(0, (who_spoke, text, time_spoken))
+            else:
+                phrases[0] = (who_spoke, text, time_spoken)
+            self.publish(trace_id)
+
+    def clear(self):
+        with self.lock:
+            for phrases in self.phrases.values():
+                phrases.clear()
+            self.publish()
+
+    def complete_phrase(self):
+        with self.lock:
+            self.publish(self.snapshot.trace_id, completed=self.snapshot.completed + 1)
+
+    def publish(self, trace_id=None, completed=None):
+        segments = tuple(merge(*self.phrases.values(), key=lambda segment: segment[2], reverse=True))[:self.max_phrases]
+        text = "".join(format_segment(who_spoke, text) for who_spoke, text, _ in segments)
+        completed = self.snapshot.completed if completed is None else completed
+        self.snapshot = TranscriptSnapshot(self.snapshot.version + 1, segments, text, trace_id, completed)
+        self.lock.notify_all()
+
+    def get_snapshot(self):
+        return self.snapshot
+
+    def changed_since(self, version):
+        return self.snapshot.version != version
+
+    def wait_for_change(self, version, timeout=None):
+        # returns the first snapshot newer than version, or None if there is none after timeout seconds
+        with self.lock:
+            if self.lock.wait_for(lambda: self.snapshot.version != version, timeout):
+                return self.snapshot
+            return None
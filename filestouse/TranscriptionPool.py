@@ -0,0 +1,204 @@
+import atexit
+import multiprocessing
+import os
+import sys
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+from Metrics import metrics
+
+WHISPER_SAMPLE_RATE = 16000
+# the transcriber never sends more than one 30 second phrase at a time
+MAX_SEGMENT_SECONDS = 30
+READY_TIMEOUT = 300
+HEALTH_CHECK_INTERVAL = 5
+PING_TIMEOUT = 2
+POLL_INTERVAL = 0.5
+# a request that takes longer than this many times its audio length, plus the margin, is treated as hung
+REQUEST_TIMEOUT_FACTOR = 10
+REQUEST_TIMEOUT_MARGIN = 30
+
+def run_worker(connection, memory_name, model_factory, threads):
+    model = model_factory()
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+    memory = shared_memory.SharedMemory(name=memory_name)
+    connection.send(("ready",))
+    try:
+        while True:
+            message = connection.recv()
+            if message[0] == "stop":
+                break
+            if message[0] == "ping":
+                connection.send(("pong",))
+                continue
+            method, length, prompt = message
+            audio = np.ndarray((length,), dtype=np.float32, buffer=memory.buf).copy()
+            if method == "get_timed_words":
+                connection.send(("done", model.get_timed_words(audio, prompt=prompt)))
+            else:
+                connection.send(("done", model.get_transcription(audio)))
+    finally:
+        memory.close()
+
+class PoolWorker:
+    def __init__(self, context, model_factory, threads, max_samples):
+        self.context = context
+        self.model_factory = model_factory
+        self.threads = threads
+        self.memory = shared_memory.SharedMemory(create=True, size=max_samples * np.dtype(np.float32).itemsize)
+        self.process = None
+        self.connection = None
+
+    def start(self):
+        self.connection, child_connection = self.context.Pipe()
+        self.process = self.context.Process(target=run_worker, args=(child_connection, self.memory.name, self.model_factory, self.threads))
+        self.process.daemon = True
+        self.process.start()
+        child_connection.close()
+        if not self.wait_for_reply(READY_TIMEOUT):
+            raise RuntimeError("transcription worker failed to start")
+
+    def wait_for_reply(self, timeout):
+        # polls in short steps so a worker that died is noticed instead of waited on
+        waited = 0.0
+        while waited < timeout:
+            try:
+                if self.connection.poll(min(POLL_INTERVAL, timeout - waited)):
+                    return self.connection.recv()
+            except (EOFError, OSError):
+                return None
+            if not self.process.is_alive():
+                return None
+            waited += min(POLL_INTERVAL, timeout - waited)
+        return None
+
+    def stop(self):
+        if self.process is not None and self.process.is_alive():
+            try:
+                self.connection.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(PING_TIMEOUT)
+            if self.process.is_alive():
+                self.process.kill()
+        if self.connection is not None:
+            self.connection.close()
+
+class TranscriptionPool:
+    """
+    Runs a transcription model in ``workers`` separate processes, so inference does not compete with
+    audio capture and the UI for the GIL.
+
+    Every worker builds its own model once with ``model_factory`` (which must be picklable, e.g. a
+    module-level function or a ``functools.partial`` of one) and limits torch to ``threads`` intra-op
+    threads, so the workers share the cores instead of oversubscribing them. Audio is copied into a
+    shared memory block owned by the worker and only the result comes back over a pipe. Idle workers
+    are pinged every ``HEALTH_CHECK_INTERVAL`` seconds, and a worker that crashes or hangs, either idle
+    or on a request that runs past ``REQUEST_TIMEOUT_FACTOR`` times its audio length plus
+    ``REQUEST_TIMEOUT_MARGIN`` seconds, is replaced with a fresh process; the request it was running fails.
+    """
+    def __init__(self, model_factory, workers=2, threads=None, max_segment_seconds=MAX_SEGMENT_SECONDS):
+        self.context = multiprocessing.get_context("spawn")
+        self.max_samples = max_segment_seconds * WHISPER_SAMPLE_RATE
+        threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        self.workers = [PoolWorker(self.context, model_factory, threads, self.max_samples) for _ in range(workers)]
+        self.idle = []
+        self.condition = threading.Condition()
+        self.closed = False
+
+        for worker in self.workers:
+            worker.start()
+            self.idle.append(worker)
+        metrics.set_gauge("transcription_pool.alive", len(self.workers))
+
+        health_check = threading.Thread(target=self.check_health)
+        health_check.daemon = True
+        health_check.start()
+        # the worker processes and their shared memory outlive the interpreter unless they are cleaned up
+        atexit.register(self.close)
+
+    def get_transcription(self, audio):
+        return self.run("get_transcription", audio)
+
+    def get_timed_words(self, audio, prompt=''):
+        return self.run("get_timed_words", audio, prompt)
+
+    def run(self, method, audio, prompt=''):
+        if len(audio) > self.max_samples:
+            raise ValueError(f"audio segment of {len(audio) / WHISPER_SAMPLE_RATE:.1f}s is longer than the pool accepts")
+        worker = self.acquire()
+        try:
+            np.ndarray((len(audio),), dtype=np.float32, buffer=worker.memory.buf)[:] = audio
+            worker.connection.send((method, len(audio), prompt))
+            timeout = REQUEST_TIMEOUT_FACTOR * len(audio) / WHISPER_SAMPLE_RATE + REQUEST_TIMEOUT_MARGIN
+            reply = worker.wait_for_reply(timeout)
+        except (BrokenPipeError, OSError):
+            reply = None
+        if reply is None:
+            self.respawn(worker)
+            raise RuntimeError("transcription worker crashed or timed out")
+        self.release(worker)
+        return reply[1]
+
+    def acquire(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.idle or self.closed)
+            if self.closed:
+                raise RuntimeError("transcription pool is closed")
+            return self.idle.pop()
+
+    def release(self, worker):
+        with self.condition:
+            self.idle.append(worker)
+            self.condition.notify()
+
+    def respawn(self, worker):
+        metrics.increment("transcription_pool.respawns")
+        metrics.set_gauge("transcription_pool.alive", len(self.workers) - 1)
+        print("[ERROR] Transcription worker stopped responding, starting a new one.")
+
+        def restart():
+            worker.stop()
+            try:
+                worker.start()
+            except RuntimeError as e:
+                print(f"[ERROR] {e}")
+                return
+            metrics.set_gauge("transcription_pool.alive", len(self.workers))
+            self.release(worker)
+
+        # loading a model takes seconds, which the caller that hit the crash should not wait for
+        restarter = threading.Thread(target=restart)
+        restarter.daemon = True
+        restarter.start()
+
+    def check_health(self):
+        while not self.closed:
+            with self.condition:
+                self.condition.wait_for(lambda: self.closed, HEALTH_CHECK_INTERVAL)
+                if self.closed:
+                    return
+                idle, self.idle = self.idle, []
+            for worker in idle:
+                try:
+                    worker.connection.send(("ping",))
+                    reply = worker.wait_for_reply(PING_TIMEOUT)
+                except (BrokenPipeError, OSError):
+                    reply = None
+                if reply is None:
+                    self.respawn(worker)
+                else:
+                    self.release(worker)
+
+    def close(self):
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.stop()
+            worker.memory.close()
+            worker.memory.unlink()
@@ -0,0 +1,98 @@
+import numpy as np
+
+FRAME_MS = 30
+PADDING_MS = 300
+HANGOVER_MS = 700
+MIN_ENERGY = 0.01
+THRESHOLD_RATIO = 3.0
+MAX_ZERO_CROSSING_RATE = 0.35
+# the noise floor follows the quietest frames, falling quickly when it gets quieter and rising slowly, per frame
+NOISE_FLOOR_PERCENTILE = 10
+NOISE_FLOOR_FALL = 0.3
+NOISE_FLOOR_RISE = 0.002
+
+class EnergyVAD:
+    """
+    Frame-level voice activity detector for a stream of 16-bit PCM chunks.
+
+    Every ``FRAME_MS`` frame is classified at once from its RMS energy and zero-crossing rate: speech has
+    to rise ``THRESHOLD_RATIO`` above an adaptive noise floor, and noisy hiss with a high zero-crossing
+    rate only counts when it is clearly loud. The floor starts low and tracks a low percentile of the
+    frame energies, so a source that starts mid-speech does not lock the threshold at speech level. ``split`` returns the voiced parts of a chunk as
+    ``(data, ended)`` pairs, where ``ended`` marks that speech stopped for longer than ``HANGOVER_MS``.
+    ``PADDING_MS`` of audio is kept on both sides of speech so words are not clipped.
+
+    Any object with the same ``split``/``reset`` methods can be used in its place.
+    """
+    def __init__(self, sample_rate, channels=1, frame_ms=FRAME_MS, padding_ms=PADDING_MS, hangover_ms=HANGOVER_MS,
+                 min_energy=MIN_ENERGY, threshold_ratio=THRESHOLD_RATIO, max_zero_crossing_rate=MAX_ZERO_CROSSING_RATE):
+        self.channels = channels
+        self.frame_length = max(1, int(sample_rate * frame_ms / 1000))
+        self.frame_bytes = self.frame_length * channels * 2
+        self.padding_frames = int(padding_ms / frame_ms)
+        self.hangover_frames = int(hangover_ms / frame_ms)
+        self.min_energy = min_energy
+        self.threshold_ratio = threshold_ratio
+        self.max_zero_crossing_rate = max_zero_crossing_rate
+        self.reset()
+
+    def reset(self):
+        self.speaking = False
+        self.silent_frames = 0
+        self.noise_floor = None
+        self.remainder = b""
+        self.preroll = b""
+
+    def classify(self, frames):
+        samples = frames.reshape(-1, self.frame_length, self.channels).mean(axis=2) / 32768.0
+        energy = np.sqrt(np.mean(samples ** 2, axis=1))
+        signs = np.signbit(samples)
+        zero_crossing_rate = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        if self.noise_floor is None:
+            self.noise_floor = self.min_energy / self.threshold_ratio
+        threshold = max(self.min_energy, self.noise_floor * self.threshold_ratio)
+        speech = (energy > threshold) & ((zero_crossing_rate < self.max_zero_crossing_rate) | (energy > 2 * threshold))
+
+        quietest = float(np.percentile(energy, NOISE_FLOOR_PERCENTILE))
+        rate = NOISE_FLOOR_FALL if quietest < self.noise_floor else NOISE_FLOOR_RISE
+        self.noise_floor += (1 - (1 - rate) ** len(energy)) * (quietest - self.noise_floor)
+        return speech
+
+    def split(self, data):
+        data = self.remainder + bytes(data)
+        frame_count = len(data) // self.frame_bytes
+        self.remainder = data[frame_count * self.frame_bytes:]
+        if frame_count == 0:
+            return []
+        speech = self.classify(np.frombuffer(data, dtype=np.int16, count=frame_count * self.frame_bytes // 2))
+
+        segments = []
+        start = 0 if self.speaking else None
+        silence_start = 0
+        for index, is_speech in enumerate(speech):
+            if is_speech:
+                if not self.speaking:
+                    self.speaking = True
+                    start = index
+                    # silence before the phrase, so its first word is not clipped
+                    self.preroll = self.keep_padding(self.preroll + data[silence_start * self.frame_bytes:start * self.frame_bytes])
+                self.silent_frames = 0
+            elif self.speaking:
+                self.silent_frames += 1
+                if self.silent_frames > self.hangover_frames:
+                    end = max(start, index + 1 - self.silent_frames + self.padding_frames)
+                    segments.append((self.preroll + data[start * self.frame_bytes:end * self.frame_bytes], True))
+                    self.preroll = b""
+                    self.speaking = False
+                    self.silent_frames = 0
+                    silence_start = end
+        if self.speaking:
+            segments.append((self.preroll + data[start * self.frame_bytes:frame_count * self.frame_bytes], False))
+            self.preroll = b""
+        else:
+            self.preroll = self.keep_padding(self.preroll + data[silence_start * self.frame_bytes:frame_count * self.frame_bytes])
+        return segments
+
+    def keep_padding(self, data):
+        return data[max(0, len(data) - self.padding_frames * self.frame_bytes):]
@@ -0,0 +1,280 @@
+import argparse
+import json
+import sys
+import threading
+import time
+import wave
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from AudioTranscriber import AudioTranscriber, TRANSCRIPTION_WORKERS, WHISPER_SAMPLE_RATE
+from AudioQueue import SourceAudioQueue, POLICIES, MAX_QUEUED_CHUNKS, MERGE
+from AudioResampler import StreamResampler
+from Metrics import metrics
+
+# the live recorders hand over a chunk at least every RECORD_TIMEOUT seconds, usually sooner
+CHUNK_SECONDS = 1.0
+SAMPLE_INTERVAL = 0.1
+SETTLE_SECONDS = 0.5
+REPORTED_HISTOGRAMS = ["stage.dequeue", "stage.encode", "stage.inference", "stage.transcript_update",
+                       "since_capture.transcript_update", "stage.llm_first_word", "since_capture.llm_first_word",
+                       "stage.llm_request_end", "since_capture.llm_request_end"]
+
+class StubModel:
+    """
+    Stands in for whisper: sleeps ``cost`` seconds per second of audio and returns one word every 0.4 s.
+
+    The words are identical on every decode, so streaming agreement commits them like a stable transcript.
+    """
+    def __init__(self, cost=0.05, words_per_second=2.5):
+        self.cost = cost
+        self.words_per_second = words_per_second
+
+    def get_transcription(self, audio):
+        return "".join(word for _, _, word in self.get_timed_words(audio)).strip()
+
+    def get_timed_words(self, audio, prompt=''):
+        duration = len(audio) / WHISPER_SAMPLE_RATE
+        time.sleep(duration * self.cost)
+        step = 1 / self.words_per_second
+        return [(i * step, (i + 1) * step, " word") for i in range(int(duration * self.words_per_second))]
+
+class FakeChatHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.requests += 1
+        try:
+            time.sleep(server.latency)
+            if request.get("stream"):
+                self.stream_response()
+                return
+            body = json.dumps({
+                "id": "chatcmpl-benchmark",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "gpt-3.5-turbo-0301",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "[Benchmark response.]"}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def stream_response(self):
+        # server-sent events, one chunk per word, like the real API with stream=True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for word in ["[Benchmark", " response.]"]:
+            chunk = {"id": "chatcmpl-benchmark", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": "gpt-3.5-turbo-0301", "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fake_chat_server(latency):
+    # answers every chat completion request after ``latency`` seconds, so no network or API key is needed
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeChatHandler)
+    server.latency = latency
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+class ReplaySource:
+    """
+    Plays a 16-bit PCM WAV file into the audio queue as if a recorder had captured it.
+
+    It exposes the same format attributes as the recorders, and like ``DefaultSpeakerRecorder`` it can
+    convert the audio to 16 kHz mono before queueing it.
+    """
+    def __init__(self, path, source_name, convert=False, chunk_seconds=CHUNK_SECONDS):
+        with wave.open(path, 'rb') as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError(f"{path} must be 16-bit PCM")
+            self.SAMPLE_RATE = wf.getframerate()
+            self.SAMPLE_WIDTH = 2
+            self.channels = wf.getnchannels()
+            self.frames = wf.readframes(wf.getnframes())
+        self.source_name = source_name
+        self.duration = len(self.frames) / (self.SAMPLE_RATE * self.SAMPLE_WIDTH * self.channels)
+        self.chunk_bytes = int(chunk_seconds * self.SAMPLE_RATE) * self.SAMPLE_WIDTH * self.channels
+        self.chunk_seconds = chunk_seconds
+        self.resampler = None
+        if convert:
+            self.resampler = StreamResampler(self.SAMPLE_RATE, WHISPER_SAMPLE_RATE, self.channels)
+            self.SAMPLE_RATE = WHISPER_SAMPLE_RATE
+            self.channels = 1
+
+    def replay(self, audio_queue, start, speed):
+        # chunks carry the time they were spoken in the recording, so phrase detection sees the real pauses
+        recorded_at = datetime.utcnow()
+        for index, offset in enumerate(range(0, len(self.frames), self.chunk_bytes)):
+            if speed > 0:
+                time.sleep(max(0.0, start + (index + 1) * self.chunk_seconds / speed - time.monotonic()))
+            trace_id = metrics.start_trace()
+            data = self.frames[offset:offset + self.chunk_bytes]
+            if self.resampler is not None:
+                data = self.resampler.process(data)
+            # like the recorders, never wait for the transcriber, so the queue policy decides what is kept
+            audio_queue.put((self.source_name, data, recorded_at + timedelta(seconds=index * self.chunk_seconds), trace_id), block=False)
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return getattr(memory, "peak_wset", memory.rss) / (1024 * 1024)
+
+def sample_queue_depth(audio_queue, start, samples, stop_event):
+    while not stop_event.is_set():
+        samples.append({"time": round(time.monotonic() - start, 3),
+                        **{source: audio_queue.qsize(source) for source in audio_queue.queues}})
+        stop_event.wait(SAMPLE_INTERVAL)
+
+def wait_until_idle(audio_queue, transcriber, responder):
+    # everything has been transcribed and answered once the pipeline stays quiet for SETTLE_SECONDS
+    quiet_since = None
+    while True:
+        busy = not audio_queue.is_idle()
+        if responder is not None:
+            busy = (busy or responder.in_flight > 0
+                    or transcriber.get_transcript_snapshot().version != responder.scheduled_version)
+        if busy:
+            quiet_since = None
+        elif quiet_since is None:
+            quiet_since = time.monotonic()
+        elif time.monotonic() - quiet_since >= SETTLE_SECONDS:
+            return time.monotonic() - SETTLE_SECONDS
+        time.sleep(SAMPLE_INTERVAL / 2)
+
+def create_models(args):
+    if args.model == "stub":
+        return [StubModel(args.stub_cost) for _ in range(TRANSCRIPTION_WORKERS)]
+    import TranscriberModels
+    return TranscriberModels.get_models(args.model == "api", TRANSCRIPTION_WORKERS, batched=args.batch,
+                                        quantized=args.model == "int8", processes=args.processes)
+
+def run_benchmark(args):
+    metrics.reset()
+    mic = ReplaySource(args.mic, "You", chunk_seconds=args.chunk_seconds)
+    speaker = ReplaySource(args.speaker, "Speaker", convert=True, chunk_seconds=args.chunk_seconds)
+    audio_queue = SourceAudioQueue(["You", "Speaker"], max_chunks=args.max_queued_chunks, policy=args.queue_policy)
+
+    models = create_models(args)
+    transcriber = AudioTranscriber(mic, speaker, models[0], streaming=not args.no_streaming)
+    transcriber.start_workers(audio_queue, models)
+
+    chat_server, responder = None, None
+    if not args.no_llm:
+        import openai
+        from GPTResponder import GPTResponder
+        chat_server = start_fake_chat_server(args.llm_latency)
+        openai.api_base = f"http://127.0.0.1:{chat_server.server_address[1]}/v1"
+        openai.api_key = "benchmark"
+        responder = GPTResponder()
+        responder.update_response_interval(args.response_interval)
+        respond = threading.Thread(target=responder.respond_to_transcriber, args=(transcriber,))
+        respond.daemon = True
+        respond.start()
+
+    depth_samples, stop_sampling = [], threading.Event()
+    start = time.monotonic()
+    sampler = threading.Thread(target=sample_queue_depth, args=(audio_queue, start, depth_samples, stop_sampling))
+    sampler.daemon = True
+    sampler.start()
+
+    players = [threading.Thread(target=source.replay, args=(audio_queue, start, args.speed)) for source in (mic, speaker)]
+    for player in players:
+        player.start()
+    for player in players:
+        player.join()
+    replayed = time.monotonic()
+    finished = wait_until_idle(audio_queue, transcriber, responder)
+    stop_sampling.set()
+    sampler.join()
+
+    snapshot = metrics.snapshot()
+    histograms = snapshot["histograms"]
+    audio_seconds = mic.duration + speaker.duration
+    peak_rss = peak_rss_mb()
+    model_seconds = snapshot["counters"].get("transcriber.inference_seconds", 0.0)
+    return {
+        "audio_seconds": round(audio_seconds, 3),
+        "wall_seconds": round(finished - start, 3),
+        "drain_seconds": round(max(0.0, finished - replayed), 3),
+        # model time per second of audio; above 1 the transcriber cannot keep up with live audio
+        "real_time_factor": round(model_seconds / audio_seconds, 4) if audio_seconds else 0.0,
+        "latency_ms": {name: {key: round(histograms[name][key], 2) for key in ("count", "p50", "p90", "p99", "max")}
+                       for name in REPORTED_HISTOGRAMS if name in histograms},
+        "queue_depth": {source: {"max": max((sample[source] for sample in depth_samples), default=0),
+                                 "mean": round(sum(sample[source] for sample in depth_samples) / max(1, len(depth_samples)), 3)}
+                        for source in audio_queue.queues},
+        "queue_depth_samples": depth_samples,
+        "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+        "llm_requests": chat_server.requests if chat_server is not None else 0,
+        "counters": snapshot["counters"],
+        "transcript": transcriber.get_transcript(),
+    }
+
+def print_report(results):
+    print(f"Audio replayed:    {results['audio_seconds']:.1f} s (mic + speaker)")
+    print(f"Wall clock:        {results['wall_seconds']:.2f} s, {results['drain_seconds']:.2f} s to drain after the last chunk")
+    print(f"Real-time factor:  {results['real_time_factor']:.4f}")
+    print(f"Peak RSS:          {results['peak_rss_mb']} MB")
+    print(f"LLM requests:      {results['llm_requests']}")
+    for source, depth in results["queue_depth"].items():
+        print(f"Queue depth {source + ':':<8} max {depth['max']}, mean {depth['mean']}")
+    print(f"{'latency (ms)':<34}{'count':>7}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for name, stats in results["latency_ms"].items():
+        print(f"{name:<34}{stats['count']:>7}{stats['p50']:>10.2f}{stats['p90']:>10.2f}{stats['p99']:>10.2f}{stats['max']:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded audio through the transcription pipeline and report its performance.")
+    parser.add_argument("mic", help="WAV file played as the microphone ('You')")
+    parser.add_argument("speaker", help="WAV file played as the speaker output ('Speaker')")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed; 1 is real time, 0 queues everything at once")
+    parser.add_argument("--chunk-seconds", type=float, default=CHUNK_SECONDS, help="length of the chunks put into the queue")
+    parser.add_argument("--queue-policy", choices=POLICIES, default=MERGE, help="what the audio queue does when it is full")
+    parser.add_argument("--max-queued-chunks", type=int, default=MAX_QUEUED_CHUNKS, help="chunks each source may have waiting")
+    parser.add_argument("--model", choices=["stub", "whisper", "int8", "api"], default="stub", help="transcription model")
+    parser.add_argument("--stub-cost", type=float, default=0.05, help="stub model seconds per second of audio")
+    parser.add_argument("--batch", action="store_true", help="share one batched whisper model between the workers")
+    parser.add_argument("--processes", action="store_true", help="run the whisper model in a pool of worker processes")
+    parser.add_argument("--no-streaming", action="store_true", help="re-transcribe whole phrases instead of streaming")
+    parser.add_argument("--no-llm", action="store_true", help="do not run the responder")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds the fake chat server takes to answer")
+    parser.add_argument("--response-interval", type=float, default=2, help="longest the scheduler waits before answering, in seconds; a completed phrase can trigger a response sooner")
+    parser.add_argument("--output", help="also write the results, including the queue depth samples, to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import time
+import warnings
+import numpy as np
+from custom_speech_recognition import dsp
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:  # removed in Python 3.13, so only the NumPy timings are shown
+        audioop = None
+
+SAMPLE_RATE = 44100
+
+def make_fragment(seconds, width, channels, seed=0):
+    samples = int(seconds * SAMPLE_RATE) * channels
+    return np.random.default_rng(seed).integers(0, 256, samples * width, dtype=np.uint8).tobytes()
+
+def operations(fragment, width):
+    other = fragment[::-1]
+    return {
+        "rms": lambda module: module.rms(fragment, width),
+        "add": lambda module: module.add(fragment, other, width),
+        "bias": lambda module: module.bias(fragment, width, -128),
+        "byteswap": lambda module: module.byteswap(fragment, width),
+        "lin2lin": lambda module: module.lin2lin(fragment, width, 4 if width != 4 else 2),
+        "tomono": lambda module: module.tomono(fragment, width, 1, 1),
+        "ratecv": lambda module: module.ratecv(fragment, width, 1, SAMPLE_RATE, 16000, None),
+    }
+
+def best_time(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the NumPy DSP functions of custom_speech_recognition against audioop on long buffers.")
+    parser.add_argument("--seconds", type=float, nargs="+", default=[1, 60, 600], help="buffer lengths to time, in seconds of 44.1 kHz stereo audio")
+    parser.add_argument("--width", type=int, default=2, choices=[1, 2, 3, 4], help="sample width in bytes")
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per function; the fastest one is reported")
+    args = parser.parse_args()
+
+    print(f"backend: {dsp.BACKEND}, sample width: {args.width} bytes")
+    print(f"{'function':<10} {'seconds':>8} {'dsp ms':>10} {'audioop ms':>11} {'speedup':>8}  same output")
+    for seconds in args.seconds:
+        fragment = make_fragment(seconds, args.width, 2)
+        for name, operation in operations(fragment, args.width).items():
+            dsp_time, dsp_result = best_time(lambda: operation(dsp), args.runs)
+            if audioop is None:
+                print(f"{name:<10} {seconds:>8g} {dsp_time * 1000:>10.2f} {'-':>11} {'-':>8}  -")
+                continue
+            audioop_time, audioop_result = best_time(lambda: operation(audioop), args.runs)
+            print(f"{name:<10} {seconds:>8g} {dsp_time * 1000:>10.2f} {audioop_time * 1000:>11.2f} "
+                  f"{audioop_time / dsp_time:>7.1f}x  {'yes' if dsp_result == audioop_result else 'NO'}")
+
+if __name__ == "__main__":
+    main()
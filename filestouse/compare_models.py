@@ -0,0 +1,61 @@
+import argparse
+import time
+import wave
+from AudioTranscriber import pcm_to_float32, WHISPER_SAMPLE_RATE
+from LocalAgreement import normalize_word
+
+def load_wav(path):
+    with wave.open(path, 'rb') as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path} must be 16-bit PCM")
+        return pcm_to_float32(wf.readframes(wf.getnframes()), wf.getframerate(), wf.getnchannels())
+
+def word_error_rate(reference, hypothesis):
+    reference = [word for word in map(normalize_word, reference.split()) if word]
+    hypothesis = [word for word in map(normalize_word, hypothesis.split()) if word]
+    if not reference:
+        return float(len(hypothesis) > 0)
+    # edit distance over words, one row at a time
+    previous = list(range(len(hypothesis) + 1))
+    for i, reference_word in enumerate(reference, 1):
+        current = [i]
+        for j, hypothesis_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (reference_word != hypothesis_word)))
+        previous = current
+    return previous[-1] / len(reference)
+
+def measure(model, audio, runs):
+    model.get_transcription(audio)  # warm up
+    start = time.monotonic()
+    for _ in range(runs):
+        text = model.get_transcription(audio)
+    elapsed = (time.monotonic() - start) / runs
+    return text, elapsed / (len(audio) / WHISPER_SAMPLE_RATE)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the int8 whisper model with the fp32 one on a recorded sample.")
+    parser.add_argument("sample", help="16-bit PCM WAV file to transcribe")
+    parser.add_argument("--reference", help="text file with the correct transcript; defaults to the fp32 output")
+    parser.add_argument("--runs", type=int, default=3, help="timed runs per model, after one warm-up run")
+    args = parser.parse_args()
+
+    import TranscriberModels
+    audio = load_wav(args.sample)
+    fp32_text, fp32_rtf = measure(TranscriberModels.WhisperTranscriber(), audio, args.runs)
+    int8_text, int8_rtf = measure(TranscriberModels.QuantizedWhisperTranscriber(), audio, args.runs)
+
+    reference = fp32_text
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as f:
+            reference = f.read()
+
+    print(f"Sample: {len(audio) / WHISPER_SAMPLE_RATE:.1f}s, reference: {args.reference or 'fp32 transcript'}")
+    print(f"{'model':<8}{'real-time factor':>18}{'WER':>8}")
+    for name, text, rtf in (("fp32", fp32_text, fp32_rtf), ("int8", int8_text, int8_rtf)):
+        print(f"{name:<8}{rtf:>18.3f}{word_error_rate(reference, text):>8.1%}")
+    print(f"int8 speedup: {fp32_rtf / int8_rtf:.2f}x")
+    print(f"fp32: {fp32_text}")
+    print(f"int8: {int8_text}")
+
+if __name__ == "__main__":
+    main()
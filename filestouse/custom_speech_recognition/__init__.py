@@ -2,6 +2,7 @@
 
 """Library for performing speech recognition, with support for several engines and APIs, online and offline."""
 
+import asyncio
 import io
 import os
 import tempfile
@@ -10,7 +11,6 @@ import subprocess
 import wave
 import aifc
 import math
-import audioop
 import collections
 import json
 import base64
@@ -33,7 +33,9 @@ from urllib.parse import urlencode
 from urllib.request import Request, urlopen
 from urllib.error import URLError, HTTPError
 
+from . import dsp
 from .audio import AudioData, get_flac_converter
+from .buffer import AudioBuffer, RingBuffer
 from .exceptions import (
     RequestError,
     TranscriptionFailed, 
@@ -70,11 +72,15 @@ class Microphone(AudioSource):
     Higher ``sample_rate`` values result in better audio quality, but also more bandwidth (and therefore, slower recognition). Additionally, some CPUs, such as those in older Raspberry Pi models, can't keep up if this value is too high.
 
     Higher ``chunk_size`` values help avoid triggering on rapidly changing ambient noise, but also makes detection less sensitive. This value, generally, should be left at its default.
+
+    If ``callback_mode`` is true, the audio is captured with PyAudio's callback API instead of blocking reads: the device delivers blocks of ``frames_per_buffer`` frames (``chunk_size`` if not specified) into a ``RingBuffer`` holding ``buffer_seconds`` seconds of audio, and reads take their audio out of the ring. The device period is then independent of ``chunk_size``, which only remains the analysis window of ``recognizer_instance.listen``, and ``listen`` measures every window that has arrived in one pass instead of reading the device once per window. Audio that arrives while the ring is full is dropped and counted in ``source.stream.ring.dropped``.
     """
-    def __init__(self, device_index=None, sample_rate=None, chunk_size=1024, speaker=False, channels = 1):
+    def __init__(self, device_index=None, sample_rate=None, chunk_size=1024, speaker=False, channels = 1, callback_mode=False, frames_per_buffer=None, buffer_seconds=5):
         assert device_index is None or isinstance(device_index, int), "Device index must be None or an integer"
         assert sample_rate is None or (isinstance(sample_rate, int) and sample_rate > 0), "Sample rate must be None or a positive integer"
         assert isinstance(chunk_size, int) and chunk_size > 0, "Chunk size must be a positive integer"
+        assert frames_per_buffer is None or (isinstance(frames_per_buffer, int) and frames_per_buffer > 0), "Frames per buffer must be None or a positive integer"
+        assert buffer_seconds > 0, "Buffer length must be positive"
 
         # set up PyAudio
         self.speaker=speaker
@@ -97,6 +103,9 @@ class Microphone(AudioSource):
         self.SAMPLE_RATE = sample_rate  # sampling rate in Hertz
         self.CHUNK = chunk_size  # number of frames stored in each buffer
         self.channels = channels
+        self.callback_mode = callback_mode
+        self.frames_per_buffer = chunk_size if frames_per_buffer is None else frames_per_buffer  # number of frames the device delivers at once in callback mode
+        self.buffer_seconds = buffer_seconds
 
         self.audio = None
         self.stream = None
@@ -162,9 +171,9 @@ class Microphone(AudioSource):
                     continue
 
                 # compute RMS of debiased audio
-                energy = -audioop.rms(buffer, 2)
+                energy = -dsp.rms(buffer, 2)
                 energy_bytes = bytes([energy & 0xFF, (energy >> 8) & 0xFF])
-                debiased_energy = audioop.rms(audioop.add(buffer, energy_bytes * (len(buffer) // 2), 2), 2)
+                debiased_energy = dsp.rms(dsp.add(buffer, energy_bytes * (len(buffer) // 2), 2), 2)
 
                 if debiased_energy > 30:  # probably actually audio
                     result[device_index] = device_name
@@ -177,25 +186,15 @@ class Microphone(AudioSource):
         self.audio = self.pyaudio_module.PyAudio()
 
         try:
-            if self.speaker:
-                p = self.audio
-                self.stream = Microphone.MicrophoneStream(
-                    p.open(
-                        input_device_index=self.device_index,
-                        channels=self.channels,
-                        format=self.format,
-                        rate=self.SAMPLE_RATE,
-                        frames_per_buffer=self.CHUNK,
-                        input=True
-                    )
-                )
+            stream_args = dict(
+                input_device_index=self.device_index, channels=self.channels if self.speaker else 1, format=self.format,
+                rate=self.SAMPLE_RATE, frames_per_buffer=self.frames_per_buffer if self.callback_mode else self.CHUNK, input=True,
+            )
+            if self.callback_mode:
+                frame_width = self.SAMPLE_WIDTH * stream_args["channels"]
+                self.stream = Microphone.CallbackStream(self.pyaudio_module, self.audio, int(self.buffer_seconds * self.SAMPLE_RATE) * frame_width, frame_width, **stream_args)
             else:
-                self.stream = Microphone.MicrophoneStream(
-                    self.audio.open(
-                        input_device_index=self.device_index, channels=1, format=self.format,
-                        rate=self.SAMPLE_RATE, frames_per_buffer=self.CHUNK, input=True,
-                    )
-                )
+                self.stream = Microphone.MicrophoneStream(self.audio.open(**stream_args))
         except Exception:
             self.audio.terminate()
         return self
@@ -222,6 +221,42 @@ class Microphone(AudioSource):
             finally:
                 self.pyaudio_stream.close()
 
+    class CallbackStream(object):
+        def __init__(self, pyaudio_module, audio, buffer_size, frame_width, **stream_args):
+            self.pyaudio_module = pyaudio_module
+            self.frame_width = frame_width  # bytes per frame, over all channels
+            self.ring = RingBuffer(max(buffer_size, stream_args["frames_per_buffer"] * frame_width), frame_width)
+            self.pyaudio_stream = audio.open(stream_callback=self.callback, **stream_args)
+
+        def callback(self, in_data, frame_count, time_info, status):
+            # runs on PortAudio's thread, so it only copies the block into the ring
+            self.ring.write(in_data)
+            return None, self.pyaudio_module.paContinue
+
+        def read(self, size):
+            self.ring.wait(size * self.frame_width)
+            buffer = self.ring.peek(size * self.frame_width)
+            self.ring.consume(len(buffer))
+            return buffer
+
+        def peek(self, size):
+            """
+            Waits for ``size`` frames of audio (or for the stream to close), and returns all the audio that has arrived without consuming it; use ``consume`` to take out what was used.
+            """
+            self.ring.wait(size * self.frame_width)
+            return self.ring.peek(len(self.ring))
+
+        def consume(self, size):
+            self.ring.consume(size)
+
+        def close(self):
+            try:
+                if not self.pyaudio_stream.is_stopped():
+                    self.pyaudio_stream.stop_stream()
+            finally:
+                self.pyaudio_stream.close()
+                self.ring.close()
+
 
 class AudioFile(AudioSource):
     """
@@ -255,7 +290,7 @@ class AudioFile(AudioSource):
         try:
             # attempt to read the file as WAV
             self.audio_reader = wave.open(self.filename_or_fileobject, "rb")
-            self.little_endian = True  # RIFF WAV is a little-endian format (most ``audioop`` operations assume that the frames are stored in little-endian form)
+            self.little_endian = True  # RIFF WAV is a little-endian format (most ``dsp`` operations assume that the frames are stored in little-endian form)
         except (wave.Error, EOFError):
             try:
                 # attempt to read the file as AIFF
@@ -290,21 +325,13 @@ class AudioFile(AudioSource):
                     raise ValueError("Audio file could not be read as PCM WAV, AIFF/AIFF-C, or Native FLAC; check if file is corrupted or in another format")
                 self.little_endian = False  # AIFF is a big-endian format
         assert 1 <= self.audio_reader.getnchannels() <= 2, "Audio must be mono or stereo"
-        self.SAMPLE_WIDTH = self.audio_reader.getsampwidth()
-
-        # 24-bit audio needs some special handling for old Python versions (workaround for https://bugs.python.org/issue12866)
-        samples_24_bit_pretending_to_be_32_bit = False
-        if self.SAMPLE_WIDTH == 3:  # 24-bit audio
-            try: audioop.bias(b"", self.SAMPLE_WIDTH, 0)  # test whether this sample width is supported (for example, ``audioop`` in Python 3.3 and below don't support sample width 3, while Python 3.4+ do)
-            except audioop.error:  # this version of audioop doesn't support 24-bit audio (probably Python 3.3 or less)
-                samples_24_bit_pretending_to_be_32_bit = True  # while the ``AudioFile`` instance will outwardly appear to be 32-bit, it will actually internally be 24-bit
-                self.SAMPLE_WIDTH = 4  # the ``AudioFile`` instance should present itself as a 32-bit stream now, since we'll be converting into 32-bit on the fly when reading
+        self.SAMPLE_WIDTH = self.audio_reader.getsampwidth()  # 24-bit audio needs no special handling, since ``dsp`` supports every sample width from 1 to 4
 
         self.SAMPLE_RATE = self.audio_reader.getframerate()
         self.CHUNK = 4096
         self.FRAME_COUNT = self.audio_reader.getnframes()
         self.DURATION = self.FRAME_COUNT / float(self.SAMPLE_RATE)
-        self.stream = AudioFile.AudioFileStream(self.audio_reader, self.little_endian, samples_24_bit_pretending_to_be_32_bit)
+        self.stream = AudioFile.AudioFileStream(self.audio_reader, self.little_endian)
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -314,10 +341,9 @@ class AudioFile(AudioSource):
         self.DURATION = None
 
     class AudioFileStream(object):
-        def __init__(self, audio_reader, little_endian, samples_24_bit_pretending_to_be_32_bit):
+        def __init__(self, audio_reader, little_endian):
             self.audio_reader = audio_reader  # an audio file object (e.g., a `wave.Wave_read` instance)
             self.little_endian = little_endian  # whether the audio data is little-endian (when working with big-endian things, we'll have to convert it to little-endian before we process it)
-            self.samples_24_bit_pretending_to_be_32_bit = samples_24_bit_pretending_to_be_32_bit  # this is true if the audio is 24-bit audio, but 24-bit audio isn't supported, so we have to pretend that this is 32-bit audio and convert it on the fly
 
         def read(self, size=-1):
             buffer = self.audio_reader.readframes(self.audio_reader.getnframes() if size == -1 else size)
@@ -325,20 +351,100 @@ class AudioFile(AudioSource):
 
             sample_width = self.audio_reader.getsampwidth()
             if not self.little_endian:  # big endian format, convert to little endian on the fly
-                if hasattr(audioop, "byteswap"):  # ``audioop.byteswap`` was only added in Python 3.4 (incidentally, that also means that we don't need to worry about 24-bit audio being unsupported, since Python 3.4+ always has that functionality)
-                    buffer = audioop.byteswap(buffer, sample_width)
-                else:  # manually reverse the bytes of each sample, which is slower but works well enough as a fallback
-                    buffer = buffer[sample_width - 1::-1] + b"".join(buffer[i + sample_width:i:-1] for i in range(sample_width - 1, len(buffer), sample_width))
-
-            # workaround for https://bugs.python.org/issue12866
-            if self.samples_24_bit_pretending_to_be_32_bit:  # we need to convert samples from 24-bit to 32-bit before we can process them with ``audioop`` functions
-                buffer = b"".join(b"\x00" + buffer[i:i + sample_width] for i in range(0, len(buffer), sample_width))  # since we're in little endian, we prepend a zero byte to each 24-bit sample to get a 32-bit sample
-                sample_width = 4  # make sure we thread the buffer as 32-bit audio now, after converting it from 24-bit audio
+                buffer = dsp.byteswap(buffer, sample_width)
             if self.audio_reader.getnchannels() != 1:  # stereo audio
-                buffer = audioop.tomono(buffer, sample_width, 1, 1)  # convert stereo audio data to mono
+                buffer = dsp.tomono(buffer, sample_width, 1, 1)  # convert stereo audio data to mono
             return buffer
 
 
+class PhraseDetector(object):
+    """
+    Creates a new ``PhraseDetector`` instance, which finds one phrase at a time in audio from ``source`` (an ``AudioSource`` instance) using the settings of ``recognizer`` (a ``Recognizer`` instance). This is the phrase detection of ``recognizer_instance.listen``, taking the audio one analysis window at a time instead of reading it itself, so any loop that has the audio can drive it.
+
+    The analysis window is ``source.CHUNK`` frames long. Each window is passed to ``process`` along with its energy (for example from ``dsp.rms`` or ``dsp.rms_windows``), which returns ``True`` once a phrase long enough to keep is complete; phrases shorter than ``recognizer.phrase_threshold`` are discarded and detection starts over by itself. ``get_audio`` then returns the phrase as an ``AudioData`` instance, and ``reset`` starts looking for the next one. ``speaking`` is whether a phrase has started, and ``elapsed_time`` is the number of seconds of audio processed so far.
+
+    The ``phrase_time_limit`` and ``audio_buffer`` parameters work in the same way as for ``recognizer_instance.listen(source)``.
+    """
+
+    def __init__(self, recognizer, source, phrase_time_limit=None, audio_buffer=None):
+        self.recognizer = recognizer
+        self.sample_rate = source.SAMPLE_RATE
+        self.sample_width = source.SAMPLE_WIDTH
+        self.phrase_time_limit = phrase_time_limit
+        self.seconds_per_window = float(source.CHUNK) / source.SAMPLE_RATE
+        self.pause_window_count = int(math.ceil(recognizer.pause_threshold / self.seconds_per_window))  # number of windows of non-speaking audio during a phrase, before the phrase should be considered complete
+        self.phrase_window_count = int(math.ceil(recognizer.phrase_threshold / self.seconds_per_window))  # minimum number of windows of speaking audio before we consider the speaking audio a phrase
+        self.non_speaking_window_count = int(math.ceil(recognizer.non_speaking_duration / self.seconds_per_window))  # maximum number of windows of non-speaking audio to retain before and after a phrase
+
+        self.frames = AudioBuffer() if audio_buffer is None else audio_buffer
+        self.window_bytes = 0  # size of a full window, used to drop whole windows from the buffer
+        self.elapsed_time = 0  # number of seconds of audio processed
+        self.reset()
+
+    def reset(self):
+        self.frames.clear()
+        self.speaking = False
+        self.phrase_start_time = None
+        self.pause_count, self.phrase_count = 0, 0
+
+    def start_phrase(self, buffer, elapsed_time):
+        """
+        Starts a phrase with the audio in ``buffer``, which took ``elapsed_time`` seconds, without checking its energy; this is how a hotword starts a phrase.
+        """
+        self.frames.extend(buffer)
+        self.elapsed_time += elapsed_time
+        self.speaking = True
+        self.phrase_start_time = self.elapsed_time
+
+    def process(self, window, energy):
+        recognizer = self.recognizer
+        self.elapsed_time += self.seconds_per_window
+        self.window_bytes = max(self.window_bytes, len(window))
+        self.frames.extend(window)
+
+        if not self.speaking:
+            self.frames.keep_last(self.non_speaking_window_count * self.window_bytes)  # ensure we only keep the needed amount of non-speaking windows
+
+            # detect whether speaking has started on audio input
+            if energy > recognizer.energy_threshold:
+                self.speaking = True
+                self.phrase_start_time = self.elapsed_time
+            elif recognizer.dynamic_energy_threshold:
+                # dynamically adjust the energy threshold using asymmetric weighted average
+                damping = recognizer.dynamic_energy_adjustment_damping ** self.seconds_per_window  # account for different chunk sizes and rates
+                target_energy = energy * recognizer.dynamic_energy_ratio
+                recognizer.energy_threshold = recognizer.energy_threshold * damping + target_energy * (1 - damping)
+        else:
+            self.phrase_count += 1
+
+            # check if speaking has stopped for longer than the pause threshold on the audio input
+            if energy > recognizer.energy_threshold:
+                self.pause_count = 0
+            else:
+                self.pause_count += 1
+            if self.pause_count > self.pause_window_count:  # end of the phrase
+                return self.end_phrase()
+
+        # handle the phrase becoming too long with the next window by cutting off the audio here
+        if self.speaking and self.phrase_time_limit and self.elapsed_time + self.seconds_per_window - self.phrase_start_time > self.phrase_time_limit:
+            self.elapsed_time += self.seconds_per_window
+            return self.end_phrase()
+        return False
+
+    def end_phrase(self):
+        # check how long the detected phrase is, and start over if the phrase is too short
+        self.phrase_count -= self.pause_count  # exclude the windows for the pause before the phrase
+        if self.phrase_count >= self.phrase_window_count:
+            return True
+        self.reset()
+        return False
+
+    def get_audio(self):
+        if self.pause_count > self.non_speaking_window_count:  # remove extra non-speaking frames at the end
+            self.frames.truncate(len(self.frames) - (self.pause_count - self.non_speaking_window_count) * self.window_bytes)
+        return AudioData(bytes(self.frames.view()), self.sample_rate, self.sample_width)
+
+
 class Recognizer(AudioSource):
     def __init__(self):
         """
@@ -407,7 +513,7 @@ class Recognizer(AudioSource):
             elapsed_time += seconds_per_buffer
             if elapsed_time > duration: break
             buffer = source.stream.read(source.CHUNK)
-            energy = audioop.rms(buffer, source.SAMPLE_WIDTH)  # energy of the audio signal
+            energy = dsp.rms(buffer, source.SAMPLE_WIDTH)  # energy of the audio signal
 
             # dynamically adjust the energy threshold using asymmetric weighted average
             damping = self.dynamic_energy_adjustment_damping ** seconds_per_buffer  # account for different chunk sizes and rates
@@ -451,7 +557,7 @@ class Recognizer(AudioSource):
             frames.append(buffer)
 
             # resample audio to the required sample rate
-            resampled_buffer, resampling_state = audioop.ratecv(buffer, source.SAMPLE_WIDTH, 1, source.SAMPLE_RATE, snowboy_sample_rate, resampling_state)
+            resampled_buffer, resampling_state = dsp.ratecv(buffer, source.SAMPLE_WIDTH, 1, source.SAMPLE_RATE, snowboy_sample_rate, resampling_state)
             resampled_frames.append(resampled_buffer)
             if time.time() - last_check > check_interval:
                 # run Snowboy on the resampled audio
@@ -463,7 +569,7 @@ class Recognizer(AudioSource):
 
         return b"".join(frames), elapsed_time
 
-    def listen(self, source, timeout=None, phrase_time_limit=None, snowboy_configuration=None):
+    def listen(self, source, timeout=None, phrase_time_limit=None, snowboy_configuration=None, audio_buffer=None):
         """
         Records a single phrase from ``source`` (an ``AudioSource`` instance) into an ``AudioData`` instance, which it returns.
 
@@ -475,6 +581,10 @@ class Recognizer(AudioSource):
 
         The ``snowboy_configuration`` parameter allows integration with `Snowboy <https://snowboy.kitt.ai/>`__, an offline, high-accuracy, power-efficient hotword recognition engine. When used, this function will pause until Snowboy detects a hotword, after which it will unpause. This parameter should either be ``None`` to turn off Snowboy support, or a tuple of the form ``(SNOWBOY_LOCATION, LIST_OF_HOT_WORD_FILES)``, where ``SNOWBOY_LOCATION`` is the path to the Snowboy root directory, and ``LIST_OF_HOT_WORD_FILES`` is a list of paths to Snowboy hotword configuration files (`*.pmdl` or `*.umdl` format).
 
+        The ``audio_buffer`` parameter is an optional ``AudioBuffer`` that the phrase is recorded into. Passing the same buffer to repeated calls reuses its preallocated memory instead of collecting every chunk separately. If ``audio_buffer`` is ``None``, a new buffer is used.
+
+        The audio is analyzed in windows of ``source.CHUNK`` frames, using a ``PhraseDetector``. If ``source`` is a ``Microphone`` in callback mode, every window that has arrived is measured in one pass, and only the audio up to the end of the phrase is taken out of the stream; otherwise, the stream is read one window at a time.
+
         This operation will always complete within ``timeout + phrase_timeout`` seconds if both are numbers, either by returning the audio data, or by raising a ``speech_recognition.WaitTimeoutError`` exception.
         """
         assert isinstance(source, AudioSource), "Source must be an audio source"
@@ -485,82 +595,50 @@ class Recognizer(AudioSource):
             for hot_word_file in snowboy_configuration[1]:
                 assert os.path.isfile(hot_word_file), "``snowboy_configuration[1]`` must be a list of Snowboy hot word configuration files"
 
-        seconds_per_buffer = float(source.CHUNK) / source.SAMPLE_RATE
-        pause_buffer_count = int(math.ceil(self.pause_threshold / seconds_per_buffer))  # number of buffers of non-speaking audio during a phrase, before the phrase should be considered complete
-        phrase_buffer_count = int(math.ceil(self.phrase_threshold / seconds_per_buffer))  # minimum number of buffers of speaking audio before we consider the speaking audio a phrase
-        non_speaking_buffer_count = int(math.ceil(self.non_speaking_duration / seconds_per_buffer))  # maximum number of buffers of non-speaking audio to retain before and after a phrase
+        detector = PhraseDetector(self, source, phrase_time_limit, audio_buffer)
+        windowed = hasattr(source.stream, "peek")  # callback-mode streams can be looked at before the audio is taken out of them
+        window_bytes = source.CHUNK * getattr(source.stream, "frame_width", source.SAMPLE_WIDTH)
 
         # read audio input for phrases until there is a phrase that is long enough
-        elapsed_time = 0  # number of seconds of audio read
-        buffer = b""  # an empty buffer means that the stream has ended and there is no data left to read
         while True:
-            frames = collections.deque()
-
-            if snowboy_configuration is None:
-                # store audio input until the phrase starts
-                while True:
-                    # handle waiting too long for phrase by raising an exception
-                    elapsed_time += seconds_per_buffer
-                    if timeout and elapsed_time > timeout:
-                        raise WaitTimeoutError("listening timed out while waiting for phrase to start")
-
-                    buffer = source.stream.read(source.CHUNK)
-                    if len(buffer) == 0: break  # reached end of the stream
-                    frames.append(buffer)
-                    if len(frames) > non_speaking_buffer_count:  # ensure we only keep the needed amount of non-speaking buffers
-                        frames.popleft()
-
-                    # detect whether speaking has started on audio input
-                    energy = audioop.rms(buffer, source.SAMPLE_WIDTH)  # energy of the audio signal
-                    if energy > self.energy_threshold: break
-
-                    # dynamically adjust the energy threshold using asymmetric weighted average
-                    if self.dynamic_energy_threshold:
-                        damping = self.dynamic_energy_adjustment_damping ** seconds_per_buffer  # account for different chunk sizes and rates
-                        target_energy = energy * self.dynamic_energy_ratio
-                        self.energy_threshold = self.energy_threshold * damping + target_energy * (1 - damping)
-            else:
+            if snowboy_configuration is not None and not detector.speaking:
                 # read audio input until the hotword is said
                 snowboy_location, snowboy_hot_word_files = snowboy_configuration
                 buffer, delta_time = self.snowboy_wait_for_hot_word(snowboy_location, snowboy_hot_word_files, source, timeout)
-                elapsed_time += delta_time
                 if len(buffer) == 0: break  # reached end of the stream
-                frames.append(buffer)
+                detector.start_phrase(buffer, delta_time)
+                continue
 
-            # read audio input until the phrase ends
-            pause_count, phrase_count = 0, 0
-            phrase_start_time = elapsed_time
-            while True:
-                # handle phrase being too long by cutting off the audio
-                elapsed_time += seconds_per_buffer
-                if phrase_time_limit and elapsed_time - phrase_start_time > phrase_time_limit:
-                    break
+            # handle waiting too long for phrase by raising an exception
+            if timeout and not detector.speaking and detector.elapsed_time + detector.seconds_per_window > timeout:
+                raise WaitTimeoutError("listening timed out while waiting for phrase to start")
 
+            if not windowed:
                 buffer = source.stream.read(source.CHUNK)
                 if len(buffer) == 0: break  # reached end of the stream
-                frames.append(buffer)
-                phrase_count += 1
-
-                # check if speaking has stopped for longer than the pause threshold on the audio input
-                energy = audioop.rms(buffer, source.SAMPLE_WIDTH)  # unit energy of the audio signal within the buffer
-                if energy > self.energy_threshold:
-                    pause_count = 0
-                else:
-                    pause_count += 1
-                if pause_count > pause_buffer_count:  # end of the phrase
+                if detector.process(buffer, dsp.rms(buffer, source.SAMPLE_WIDTH)): break
+                continue
+
+            # measure every window that has arrived at once, then run them through the detector until the phrase is complete; the windows after that are left in the stream for the next call
+            block = source.stream.peek(source.CHUNK)
+            if len(block) == 0: break  # reached end of the stream
+            if len(block) >= window_bytes:
+                block = block[:len(block) - len(block) % window_bytes]  # a partial window is only used once the stream has ended
+            used, complete = 0, False
+            for energy in dsp.rms_windows(block, source.SAMPLE_WIDTH, window_bytes):
+                if timeout and not detector.speaking and detector.elapsed_time + detector.seconds_per_window > timeout:
                     break
+                window = block[used:used + window_bytes]
+                used += len(window)
+                if detector.process(window, energy) or (snowboy_configuration is not None and not detector.speaking):
+                    complete = detector.speaking
+                    break
+            source.stream.consume(used)
+            if complete: break
 
-            # check how long the detected phrase is, and retry listening if the phrase is too short
-            phrase_count -= pause_count  # exclude the buffers for the pause before the phrase
-            if phrase_count >= phrase_buffer_count or len(buffer) == 0: break  # phrase is long enough or we've reached the end of the stream, so stop listening
-
-        # obtain frame data
-        for i in range(pause_count - non_speaking_buffer_count): frames.pop()  # remove extra non-speaking frames at the end
-        frame_data = b"".join(frames)
-
-        return AudioData(frame_data, source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        return detector.get_audio()
 
-    def listen_in_background(self, source, callback, phrase_time_limit=None):
+    def listen_in_background(self, source, callback, phrase_time_limit=None, audio_buffer=None):
         """
         Spawns a thread to repeatedly record phrases from ``source`` (an ``AudioSource`` instance) into an ``AudioData`` instance and call ``callback`` with that ``AudioData`` instance as soon as each phrase are detected.
 
@@ -569,15 +647,18 @@ class Recognizer(AudioSource):
         Phrase recognition uses the exact same mechanism as ``recognizer_instance.listen(source)``. The ``phrase_time_limit`` parameter works in the same way as the ``phrase_time_limit`` parameter for ``recognizer_instance.listen(source)``, as well.
 
         The ``callback`` parameter is a function that should accept two parameters - the ``recognizer_instance``, and an ``AudioData`` instance representing the captured audio. Note that ``callback`` function will be called from a non-main thread.
+
+        The ``audio_buffer`` parameter is an optional ``AudioBuffer`` that is reused for every phrase, as in ``recognizer_instance.listen(source, audio_buffer=audio_buffer)``. If ``audio_buffer`` is ``None``, one buffer is allocated for the lifetime of the listener.
         """
         assert isinstance(source, AudioSource), "Source must be an audio source"
         running = [True]
+        if audio_buffer is None: audio_buffer = AudioBuffer()
 
         def threaded_listen():
             with source as s:
                 while running[0]:
                     try:  # listen for 1 second, then check again if the stop function has been called
-                        audio = self.listen(s, 1, phrase_time_limit)
+                        audio = self.listen(s, 1, phrase_time_limit, audio_buffer=audio_buffer)
                     except WaitTimeoutError:  # listening timed out, just try again
                         pass
                     else:
@@ -593,6 +674,61 @@ class Recognizer(AudioSource):
         listener_thread.start()
         return stopper
 
+    async def phrases(self, source, phrase_time_limit=None, audio_buffer=None):
+        """
+        Asynchronously yields every phrase recorded from ``source`` (an ``AudioSource`` instance) as an ``AudioData`` instance, for use as ``async for audio in recognizer_instance.phrases(source)``. ``source`` is entered for as long as the iteration runs, like in ``recognizer_instance.listen_in_background``, and the iteration ends when the source runs out of audio.
+
+        Phrase detection is the same as in ``recognizer_instance.listen(source)``, and the ``phrase_time_limit`` and ``audio_buffer`` parameters work in the same way. If ``source`` is a ``Microphone`` in callback mode, nothing blocks the event loop and no thread is started: the coroutine sleeps until the device callback hands over new audio, and then measures all of it in one pass. Other sources are read one window at a time in the event loop's default executor.
+
+        Phrases are only detected as the consumer asks for them, so a slow consumer applies backpressure: in callback mode, the audio waits in the source's ring buffer meanwhile, and once that is full the newest audio is dropped and counted in ``source.stream.ring.dropped``. Stopping is cooperative: cancelling the task running the loop, or closing the iterator (for example with ``contextlib.aclosing`` around it, when breaking out of the loop), closes the source right away in callback mode, instead of after a ``listen`` timeout like ``listen_in_background``.
+        """
+        assert isinstance(source, AudioSource), "Source must be an audio source"
+        assert self.pause_threshold >= self.non_speaking_duration >= 0
+        loop = asyncio.get_running_loop()
+
+        with source as s:
+            detector = PhraseDetector(self, s, phrase_time_limit, audio_buffer)
+            ring = getattr(s.stream, "ring", None)
+            if ring is None:
+                while True:
+                    buffer = await loop.run_in_executor(None, s.stream.read, s.CHUNK)
+                    if len(buffer) == 0: break  # reached end of the stream
+                    if detector.process(buffer, dsp.rms(buffer, s.SAMPLE_WIDTH)):
+                        yield detector.get_audio()
+                        detector.reset()
+            else:
+                window_bytes = s.CHUNK * s.stream.frame_width
+                arrived = asyncio.Event()
+                ring.on_write = lambda: loop.call_soon_threadsafe(arrived.set)
+                try:
+                    while True:
+                        # wait for a whole window without blocking the event loop
+                        while len(ring) < window_bytes and not ring.closed:
+                            arrived.clear()
+                            if len(ring) >= window_bytes or ring.closed: break  # the callback wrote between the check and clearing the event
+                            await arrived.wait()
+                        block = ring.peek(len(ring))
+                        if len(block) == 0: break  # reached end of the stream
+                        if len(block) >= window_bytes:
+                            block = block[:len(block) - len(block) % window_bytes]  # a partial window is only used once the stream has ended
+
+                        used, complete = 0, False
+                        for energy in dsp.rms_windows(block, s.SAMPLE_WIDTH, window_bytes):
+                            window = block[used:used + window_bytes]
+                            used += len(window)
+                            if detector.process(window, energy):
+                                complete = True
+                                break
+                        ring.consume(used)
+                        if complete:
+                            yield detector.get_audio()
+                            detector.reset()
+                finally:
+                    ring.on_write = None
+
+            if detector.speaking:  # the stream ended during a phrase
+                yield detector.get_audio()
+
     def recognize_sphinx(self, audio_data, language="en-US", keyword_entries=None, grammar=None, show_all=False):
         """
         Performs speech recognition on ``audio_data`` (an ``AudioData`` instance), using CMU Sphinx.
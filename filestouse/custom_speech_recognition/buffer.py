@@ -0,0 +1,149 @@
+import threading
+
+
+class AudioBuffer(object):
+    """
+    Creates a new ``AudioBuffer`` instance, a preallocated, growable byte buffer for raw PCM audio.
+
+    Appending with ``extend`` copies the new bytes once into spare capacity instead of rebuilding an immutable ``bytes`` object, and ``discard_front`` only moves a start offset, so dropping old audio is amortized O(1).
+
+    The buffer starts with ``initial_size`` bytes of capacity and doubles as needed. If ``max_size`` is given, it is a hard cap on the number of bytes held: appending beyond it discards the oldest audio, rounded to whole frames of ``frame_width`` bytes. The number of bytes dropped from the front since the last ``clear`` is available as ``discarded``.
+
+    ``view`` returns a zero-copy ``memoryview`` of the held audio. A view is only valid until the next call that modifies the buffer.
+    """
+
+    def __init__(self, initial_size=65536, max_size=None, frame_width=1):
+        assert max_size is None or max_size >= frame_width, "``max_size`` must hold at least one frame"
+        self.max_size = None if max_size is None else max_size - max_size % frame_width
+        self.frame_width = frame_width
+        self._data = bytearray(initial_size if self.max_size is None else min(initial_size, 2 * self.max_size))
+        self._start = 0
+        self._end = 0
+        self.discarded = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def extend(self, data):
+        size = len(data)
+        if self.max_size is not None:
+            if size > self.max_size:  # only the newest audio fits
+                self.discard_front(len(self))
+                self.discarded += size - self.max_size
+                data = memoryview(data)[size - self.max_size:]
+                size = self.max_size
+            overflow = len(self) + size - self.max_size
+            if overflow > 0:
+                self.discard_front(overflow + (-overflow) % self.frame_width)
+
+        if self._end + size > len(self._data):
+            self._reserve(len(self) + size)
+        self._data[self._end:self._end + size] = data
+        self._end += size
+
+    def _reserve(self, size):
+        if size <= len(self._data) // 2:
+            # at least half the capacity is reclaimed, which keeps compaction amortized O(1) per byte
+            self._data[:len(self)] = self._data[self._start:self._end]
+        else:
+            capacity = max(size, 2 * len(self._data))
+            if self.max_size is not None:
+                capacity = min(capacity, 2 * self.max_size)
+            data = bytearray(capacity)
+            data[:len(self)] = memoryview(self._data)[self._start:self._end]
+            self._data = data
+        self._end -= self._start
+        self._start = 0
+
+    def view(self, start=0, end=None):
+        length = len(self)
+        end = length if end is None else min(end, length)
+        return memoryview(self._data)[self._start + min(start, end):self._start + end]
+
+    def discard_front(self, size):
+        size = max(0, min(size, len(self)))
+        self._start += size
+        self.discarded += size
+        if self._start == self._end:
+            self._start = self._end = 0
+
+    def keep_last(self, size):
+        self.discard_front(len(self) - size)
+
+    def truncate(self, size):
+        self._end = self._start + max(0, min(size, len(self)))
+
+    def clear(self):
+        self._start = self._end = 0
+        self.discarded = 0
+
+
+class RingBuffer(object):
+    """
+    Creates a new ``RingBuffer`` instance, a fixed-size ring of raw PCM audio with one producer, such as an audio device callback, and one consumer, such as ``recognizer_instance.listen``.
+
+    The ring holds up to ``size`` bytes, rounded down to whole frames of ``frame_width`` bytes. The audio itself is copied in and out without locks: the producer only ever moves the write position and the consumer only ever moves the read position, each after it is done with the bytes in between, so neither can see a half-written block. If the consumer falls so far behind that a ``write`` does not fit, the newest audio that does not fit is dropped (the producer must never wait on the consumer), and the number of bytes dropped so far is available as ``dropped``.
+
+    The consumer looks at the audio with ``peek`` without taking it out, and then takes out as much as it has used with ``consume``, so it can analyze a long block at once and leave the rest for later. ``wait`` blocks until enough audio has arrived. After ``close``, waiting returns immediately, and the audio still held can be read out.
+
+    A consumer that cannot block, such as a coroutine, can set ``on_write`` to a function that is called from the producer's thread after every write and on ``close``, and wait for that instead.
+    """
+
+    def __init__(self, size, frame_width=1):
+        assert size >= frame_width, "``size`` must hold at least one frame"
+        self.size = size - size % frame_width
+        self.frame_width = frame_width
+        self._data = bytearray(self.size)
+        self._written = 0  # total number of bytes ever written, only changed by the producer
+        self._read = 0  # total number of bytes ever consumed, only changed by the consumer
+        self._ready = threading.Event()
+        self.dropped = 0
+        self.closed = False
+        self.on_write = None
+
+    def __len__(self):
+        return self._written - self._read
+
+    def write(self, data):
+        size = len(data)
+        free = self.size - (self._written - self._read)
+        if size > free:
+            self.dropped += size - free + free % self.frame_width
+            size = free - free % self.frame_width
+        data = memoryview(data)
+        start = self._written % self.size
+        first = min(size, self.size - start)
+        self._data[start:start + first] = data[:first]
+        self._data[:size - first] = data[first:size]
+        self._written += size  # publish the block only once it has been copied in
+        self._ready.set()
+        on_write = self.on_write
+        if on_write is not None: on_write()
+
+    def wait(self, size, timeout=None):
+        """
+        Blocks until at least ``size`` bytes can be read, the ring is closed, or ``timeout`` seconds (if not ``None``) have passed. Returns whether ``size`` bytes can be read.
+        """
+        while len(self) < size and not self.closed:
+            self._ready.clear()
+            if len(self) >= size or self.closed: break  # the producer wrote between the check and clearing the event
+            if not self._ready.wait(timeout): break
+        return len(self) >= size
+
+    def peek(self, size):
+        """
+        Returns a copy of up to ``size`` of the oldest unread bytes, without consuming them.
+        """
+        size = min(size, len(self))
+        start = self._read % self.size
+        first = min(size, self.size - start)
+        return bytes(self._data[start:start + first]) + bytes(self._data[:size - first])
+
+    def consume(self, size):
+        self._read += max(0, min(size, len(self)))
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+        on_write = self.on_write
+        if on_write is not None: on_write()
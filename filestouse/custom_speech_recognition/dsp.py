@@ -0,0 +1,261 @@
+"""
+Vectorized replacements for the ``audioop`` functions this package uses: ``rms``, ``add``, ``bias``, ``byteswap``, ``lin2lin``, ``tomono`` and ``ratecv``.
+
+``audioop`` was deprecated in Python 3.11 and removed in Python 3.13, and it works one sample at a time in C, which is fine for a 1024-sample microphone buffer but adds up over minutes of audio. The functions here take and return the same arguments and values as their ``audioop`` counterparts (little-endian, signed samples of 1 to 4 bytes, including 24-bit, and the same ``ratecv`` state tuples), so the two can be swapped freely, and they work on whole buffers at once with NumPy. ``rms_windows`` has no ``audioop`` counterpart: it measures the loudness of many consecutive analysis windows at once.
+
+Fallback strategy: NumPy is used whenever it can be imported, which is the normal case since it is in ``requirements.txt``. Without NumPy, the module falls back to ``audioop`` itself, which ships with Python up to 3.12. With neither, importing this module raises an ``ImportError`` that says what to install. The backend in use is available as ``BACKEND`` (``"numpy"`` or ``"audioop"``).
+
+Invalid fragments (sample widths other than 1 to 4, or a length that is not a whole number of frames) raise ``error``, which is ``audioop.error`` under the ``audioop`` backend.
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is not installed; the ``audioop`` fallback is set up at the bottom of this module
+    np = None
+
+
+class error(Exception):
+    pass
+
+
+_DTYPES = {1: "<i1", 2: "<i2", 4: "<i4"}
+
+# samples are processed this many at a time, so the temporary arrays stay in the CPU cache instead of costing a pass over main memory each
+BLOCK_SAMPLES = 1 << 16
+
+
+def _check(fragment, width, frame_width=None):
+    if width not in (1, 2, 3, 4):
+        raise error("Size should be 1, 2, 3 or 4")
+    if len(fragment) % (frame_width or width) != 0:
+        raise error("not a whole number of frames")
+
+
+def _limits(width):
+    return -(1 << (8 * width - 1)), (1 << (8 * width - 1)) - 1
+
+
+def _sum_dtype(width):
+    # the sum of two samples needs one more bit than the samples themselves
+    return np.int64 if width == 4 else np.int32
+
+
+def _blocks(count, block=BLOCK_SAMPLES):
+    for start in range(0, count, block):
+        yield start, min(start + block, count)
+
+
+def _read(data, width, start, stop):
+    """
+    Returns samples ``start`` to ``stop`` of the byte array ``data`` as signed integers, without copying where the sample width allows it.
+    """
+    if width != 3:
+        return data[start * width:stop * width].view(_DTYPES[width])
+    # 24-bit samples have no NumPy dtype, so each one is read as the top three bytes of an overlapping 32-bit integer that starts one byte earlier, and shifted down, which also sign-extends it
+    window = np.concatenate([np.zeros(1, dtype=np.uint8), data[:stop * 3]]) if start == 0 else data[start * 3 - 1:stop * 3]
+    return np.ndarray((stop - start,), dtype="<i4", buffer=window, strides=(3,)) >> 8
+
+
+def _write(out, width, start, samples):
+    """
+    Stores the integer ``samples`` in the byte array ``out`` as ``width``-byte samples from sample ``start`` on. Values that do not fit are wrapped, not clipped; callers that need clipping do it first.
+    """
+    if width != 3:
+        out[start * width:(start + len(samples)) * width].view(_DTYPES[width])[:] = samples
+    else:
+        out[start * 3:(start + len(samples)) * 3].reshape(-1, 3)[:] = samples.astype("<i4").view(np.uint8).reshape(-1, 4)[:, :3]
+
+
+def _map(fragment, width, newwidth, function):
+    """
+    Returns the fragment of ``newwidth``-byte samples that ``function`` computes from each block of the samples in ``fragment``.
+    """
+    data = np.frombuffer(fragment, dtype=np.uint8)
+    count = len(data) // width
+    out = np.empty(count * newwidth, dtype=np.uint8)
+    for start, stop in _blocks(count):
+        _write(out, newwidth, start, function(_read(data, width, start, stop)))
+    return out.tobytes()
+
+
+def rms(fragment, width):
+    """
+    Returns the root-mean-square of the samples in ``fragment``, a measure of its loudness, as an integer (``0`` for an empty fragment).
+    """
+    _check(fragment, width)
+    if len(fragment) == 0:
+        return 0
+    data = np.frombuffer(fragment, dtype=np.uint8)
+    count = len(data) // width
+    sum_squares = 0.0
+    for start, stop in _blocks(count):
+        samples = _read(data, width, start, stop).astype(np.float64)
+        sum_squares += np.dot(samples, samples)
+    return int(math.sqrt(sum_squares / count))
+
+
+def rms_windows(fragment, width, window):
+    """
+    Returns a list of the ``rms`` of every consecutive ``window`` bytes of ``fragment``, the last window being shorter if ``fragment`` does not divide evenly. This is the same as calling ``rms`` on each window, but the full windows are measured in one pass.
+    """
+    _check(fragment, width)
+    _check(b"", width, window)
+    full = len(fragment) // window
+    data = np.frombuffer(fragment, dtype=np.uint8)
+    energies = []
+    per_block = max(1, BLOCK_SAMPLES * width // window)
+    for start, stop in _blocks(full, per_block):
+        samples = _read(data, width, start * window // width, stop * window // width).astype(np.float64).reshape(stop - start, -1)
+        energies.extend(np.sqrt(np.einsum("ij,ij->i", samples, samples) / samples.shape[1]).astype(np.int64).tolist())
+    if len(fragment) % window:
+        energies.append(rms(fragment[full * window:], width))
+    return energies
+
+
+def add(fragment1, fragment2, width):
+    """
+    Returns the sample-by-sample sum of two fragments of the same length, clipped to the range of the sample width.
+    """
+    _check(fragment1, width)
+    if len(fragment1) != len(fragment2):
+        raise error("Lengths should be the same")
+    other = np.frombuffer(fragment2, dtype=np.uint8)
+    lower, upper = _limits(width)
+    position = [0]
+
+    def add_block(samples):
+        start = position[0]
+        position[0] += len(samples)
+        total = samples.astype(_sum_dtype(width))
+        total += _read(other, width, start, start + len(samples))
+        return np.clip(total, lower, upper, out=total)
+
+    return _map(fragment1, width, width, add_block)
+
+
+def bias(fragment, width, bias):
+    """
+    Returns ``fragment`` with ``bias`` added to every sample, wrapping around on overflow like ``audioop.bias`` does. This is what converts between unsigned and signed 8-bit audio.
+    """
+    _check(fragment, width)
+    if width != 3:  # unsigned integers of the sample width already wrap around on overflow
+        unsigned = _DTYPES[width].replace("i", "u")
+        return (np.frombuffer(fragment, dtype=unsigned) + np.array(bias % (1 << (8 * width)), dtype=unsigned)).tobytes()
+    return _map(fragment, width, width, lambda samples: samples + bias % (1 << 24))
+
+
+def byteswap(fragment, width):
+    """
+    Returns ``fragment`` with the byte order of every sample reversed, converting between little-endian and big-endian audio.
+    """
+    _check(fragment, width)
+    if width == 1:
+        return bytes(fragment)
+    if width != 3:
+        return np.frombuffer(fragment, dtype=_DTYPES[width]).astype(_DTYPES[width].replace("<", ">")).tobytes()
+    return np.frombuffer(fragment, dtype=np.uint8).reshape(-1, 3)[:, ::-1].tobytes()
+
+
+def lin2lin(fragment, width, newwidth):
+    """
+    Returns ``fragment`` converted from ``width``-byte samples to ``newwidth``-byte samples, keeping the most significant bits.
+    """
+    _check(fragment, width)
+    _check(b"", newwidth)
+
+    def convert_block(samples):
+        samples = samples.astype(np.int32)
+        samples <<= 32 - 8 * width
+        samples >>= 32 - 8 * newwidth
+        return samples
+
+    return _map(fragment, width, newwidth, convert_block)
+
+
+def tomono(fragment, width, lfactor, rfactor):
+    """
+    Returns the stereo ``fragment`` mixed down to mono, as ``left * lfactor + right * rfactor`` clipped to the range of the sample width.
+    """
+    _check(fragment, width, 2 * width)
+    data = np.frombuffer(fragment, dtype=np.uint8)
+    count = len(data) // (2 * width)
+    lower, upper = _limits(width)
+    out = np.empty(count * width, dtype=np.uint8)
+    for start, stop in _blocks(count):
+        channels = _read(data, width, 2 * start, 2 * stop).reshape(-1, 2)
+        if lfactor == rfactor == 1:  # the common case stays in integers
+            mixed = channels[:, 0].astype(_sum_dtype(width)) + channels[:, 1]
+        else:  # like ``audioop``, mix in floating point and round towards minus infinity
+            mixed = np.floor(channels[:, 0] * float(lfactor) + channels[:, 1] * float(rfactor))
+        _write(out, width, start, np.clip(mixed, lower, upper))
+    return out.tobytes()
+
+
+def ratecv(fragment, width, nchannels, inrate, outrate, state, weightA=1, weightB=0):
+    """
+    Returns a tuple ``(newfragment, newstate)``, where ``newfragment`` is ``fragment`` resampled from ``inrate`` to ``outrate`` Hz by linear interpolation, and ``newstate`` is the state to pass in with the next fragment of the same stream (``None`` for the first one).
+
+    The output and the state are the same as ``audioop.ratecv``'s, so a stream can be resampled one buffer at a time and still come out identical to resampling it in one piece. ``weightA`` and ``weightB`` set the optional low-pass filter that ``audioop`` applies to the input; with the default weights there is no filter, and the whole fragment is resampled at once.
+    """
+    _check(fragment, width, width * nchannels)
+    if nchannels < 1:
+        raise error("# of channels should be >= 1")
+    if inrate <= 0 or outrate <= 0:
+        raise error("sampling rate not > 0")
+    if weightA < 1 or weightB < 0:
+        raise error("weightA should be >= 1, weightB should be >= 0")
+    divisor = math.gcd(inrate, outrate)
+    inrate, outrate = inrate // divisor, outrate // divisor
+    divisor = math.gcd(weightA, weightB)
+    weightA, weightB = weightA // divisor, weightB // divisor
+
+    data = np.frombuffer(fragment, dtype=np.uint8)
+    count = len(data) // (width * nchannels)
+    # ``history[k]`` and ``history[k + 1]`` are the two newest input frames once ``k`` frames have been read; like in ``audioop``, they are scaled up to 32 bits, which is also how the state holds them
+    history = np.empty((count + 2, nchannels), dtype=np.int64)
+    if state is None:
+        d = -outrate
+        history[:2] = 0
+    else:
+        d, samples = state
+        if len(samples) != nchannels:
+            raise error("illegal state argument")
+        history[:2] = np.array(samples, dtype=np.int64).T
+    for start, stop in _blocks(count):
+        history[2 + start:2 + stop] = _read(data, width, start * nchannels, stop * nchannels).reshape(-1, nchannels)
+    history[2:] <<= 32 - 8 * width
+    if weightB != 0:  # the filter feeds back on its own output, so it has to run one frame at a time
+        for k in range(2, count + 2):
+            history[k] = np.trunc((weightA * history[k].astype(np.float64) + weightB * history[k - 1]) / (weightA + weightB))
+
+    # ``d`` goes up by ``outrate`` for every input frame read and down by ``inrate`` for every output frame written; output frame ``j`` is written as soon as it is non-negative
+    total = d + count * outrate
+    outputs = total // inrate + 1 if total >= 0 else 0
+    out = np.empty(outputs * nchannels * width, dtype=np.uint8)
+    for start, stop in _blocks(outputs):
+        j = np.arange(start, stop, dtype=np.int64)
+        read = np.maximum(0, -((d - j * inrate) // outrate))
+        phase = (d + read * outrate - j * inrate).astype(np.float64)[:, np.newaxis]
+        interpolated = (history[read] * phase + history[read + 1] * (outrate - phase)) / outrate
+        _write(out, width, start * nchannels, (np.trunc(interpolated).astype(np.int64) >> (32 - 8 * width)).ravel())
+
+    newstate = (int(total - outputs * inrate), tuple((int(p), int(c)) for p, c in zip(history[-2], history[-1])))
+    return out.tobytes(), newstate
+
+
+BACKEND = "numpy"
+
+if np is None:
+    try:
+        import audioop
+    except ImportError:  # ``audioop`` was removed in Python 3.13
+        raise ImportError("custom_speech_recognition needs NumPy for audio processing on this version of Python; install it with ``pip install numpy``")
+    BACKEND = "audioop"
+    error = audioop.error
+    rms, add, bias, byteswap = audioop.rms, audioop.add, audioop.bias, audioop.byteswap
+
+    def rms_windows(fragment, width, window):
+        return [audioop.rms(fragment[start:start + window], width) for start in range(0, len(fragment), window)]
+    lin2lin, tomono, ratecv = audioop.lin2lin, audioop.tomono, audioop.ratecv
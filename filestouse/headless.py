@@ -0,0 +1,122 @@
+import argparse
+import json
+import socket
+import sys
+import threading
+from datetime import datetime
+from Metrics import metrics
+from Pipeline import create_pipeline, start_pipeline
+
+# an untimed wait on a lock cannot be interrupted by Ctrl-C on Windows, so the emitters wake up this often
+WAIT_TIMEOUT = 0.5
+# a client that takes longer than this to accept an event is dropped instead of stalling everyone else
+SEND_TIMEOUT = 2
+
+class StdoutSink:
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def write(self, line):
+        with self.lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+class SocketSink:
+    """
+    Serves the event stream on a local TCP port; every connected client gets each event from then on.
+    """
+    def __init__(self, port, host="127.0.0.1"):
+        self.server = socket.create_server((host, port))
+        self.clients = []
+        self.lock = threading.Lock()
+        acceptor = threading.Thread(target=self.accept_clients)
+        acceptor.daemon = True
+        acceptor.start()
+
+    def accept_clients(self):
+        while True:
+            client, _ = self.server.accept()
+            client.settimeout(SEND_TIMEOUT)
+            with self.lock:
+                self.clients.append(client)
+
+    def write(self, line):
+        data = line.encode("utf-8")
+        with self.lock:
+            for client in list(self.clients):
+                try:
+                    client.sendall(data)
+                except OSError:
+                    # includes the timeout of a client that stopped reading; a partly sent line cannot be finished
+                    self.clients.remove(client)
+                    client.close()
+
+def emit(sink, event):
+    event["time"] = datetime.utcnow().isoformat() + "Z"
+    sink.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+def emit_transcripts(transcriber, sink):
+    # waits on the store between changes, so an idle pipeline costs next to nothing
+    version = 0
+    while True:
+        snapshot = transcriber.transcript.wait_for_change(version, WAIT_TIMEOUT)
+        if snapshot is None:
+            continue
+        version = snapshot.version
+        emit(sink, {
+            "type": "transcript",
+            "version": snapshot.version,
+            "completed_phrases": snapshot.completed,
+            "segments": [{"speaker": who_spoke, "text": text, "time_spoken": time_spoken.isoformat() + "Z"}
+                         for who_spoke, text, time_spoken in snapshot.segments],
+        })
+
+def emit_responses(responder, sink):
+    version = responder.version
+    while True:
+        result = responder.wait_for_response(version, WAIT_TIMEOUT)
+        if result is None:
+            continue
+        version, response = result
+        emit(sink, {"type": "response", "version": version, "text": response})
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the capture, transcription and response pipeline without a window, "
+                                                 "writing transcript and response events as newline-delimited JSON.")
+    parser.add_argument("--socket", type=int, metavar="PORT", help="serve the events on this local TCP port instead of stdout")
+    parser.add_argument("--api", action="store_true", help="transcribe with the whisper API")
+    parser.add_argument("--batch", action="store_true", help="share one batched whisper model between the workers")
+    parser.add_argument("--int8", action="store_true", help="run the local model with int8 weights")
+    parser.add_argument("--processes", action="store_true", help="run the local model in worker processes")
+    # read again from sys.argv by start_pipeline, which imports the audio queue only after the window or sink is up
+    parser.add_argument("--queue-policy", help="what the audio queue does when it is full: merge (default), drop_oldest or block")
+    parser.add_argument("--max-queued-chunks", type=int, help="chunks each source may have waiting (default 8)")
+    parser.add_argument("--metrics", action="store_true", help="write latency metrics to metrics.json on exit")
+    args = parser.parse_args()
+
+    # stdout carries the events, so the pipeline's own log lines go to stderr
+    sink = SocketSink(args.socket) if args.socket else StdoutSink(sys.stdout)
+    sys.stdout = sys.stderr
+
+    pipeline = create_pipeline()
+    start_pipeline(pipeline)
+    if pipeline["transcriber"] is None:
+        emit(sink, {"type": "error", "message": pipeline["error"]})
+        sys.exit(1)
+    emit(sink, {"type": "ready"})
+
+    responses = threading.Thread(target=emit_responses, args=(pipeline["responder"], sink))
+    responses.daemon = True
+    responses.start()
+    try:
+        emit_transcripts(pipeline["transcriber"], sink)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.metrics:
+            metrics.dump_json("metrics.json")
+            print("[INFO] Latency metrics written to metrics.json")
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,55 @@
 import threading
-from AudioTranscriber import AudioTranscriber
-from GPTResponder import GPTResponder
-import customtkinter as ctk
-import AudioRecorder 
-import queue
 import time
-import torch
 import sys
-import TranscriberModels
-import subprocess
-
-def write_in_textbox(textbox, text):
-    textbox.delete("0.0", "end")
-    textbox.insert("0.0", text)
-
-def update_transcript_UI(transcriber, textbox):
-    transcript_string = transcriber.get_transcript()
-    write_in_textbox(textbox, transcript_string)
-    textbox.after(300, update_transcript_UI, transcriber, textbox)
-
-def update_response_UI(responder, textbox, update_interval_slider_label, update_interval_slider, freeze_state):
-    if not freeze_state[0]:
-        response = responder.response
+from Metrics import metrics
+from Pipeline import create_pipeline, start_pipeline, timed_phase
+from TextboxRenderer import TextboxRenderer
+from TranscriptStore import format_segment
+import customtkinter as ctk
 
-        textbox.configure(state="normal")
-        write_in_textbox(textbox, response)
-        textbox.configure(state="disabled")
+# start_pipeline runs in the background, so the window appears before the model and audio devices are ready
+
+LOADING_MESSAGE = "Loading the transcription model and calibrating the mic and speaker..."
+STARTUP_FAILED_MESSAGE = "Startup failed: {error}\nSee the console for details, then restart Ecoute."
+RESPONSE_UI_INTERVAL_MS = 100
+
+def update_transcript_UI(pipeline, renderer):
+    transcriber = pipeline["transcriber"]
+    if pipeline["error"] is not None:
+        renderer.render("error", [STARTUP_FAILED_MESSAGE.format(error=pipeline["error"])])
+    elif transcriber is None:
+        renderer.render("loading", [LOADING_MESSAGE])
+    else:
+        snapshot = transcriber.get_transcript_snapshot()
+        if renderer.render(snapshot.version, [format_segment(who_spoke, text) for who_spoke, text, _ in snapshot.segments]):
+            metrics.mark(snapshot.trace_id, "transcript_render")
+        if snapshot.text and "first_transcript" not in pipeline:
+            pipeline["first_transcript"] = time.monotonic() - pipeline["started"]
+            metrics.set_gauge("startup.first_transcript_seconds", pipeline["first_transcript"])
+            print(f"[INFO] Startup: first transcript after {pipeline['first_transcript']:.2f}s")
+    renderer.textbox.after(300, update_transcript_UI, pipeline, renderer)
+
+def update_response_UI(pipeline, renderer, update_interval_slider_label, update_interval_slider, freeze_state):
+    responder = pipeline["responder"]
+    if not freeze_state[0] and responder is not None:
+        # the version is read first, so a response that changes in between is drawn again on the next check
+        version = responder.version
+        # the response streams in word by word, so it is checked often but only redrawn when it changed
+        if renderer.render(version, [responder.response]):
+            metrics.mark(responder.response_trace_id, "response_render")
 
         update_interval = int(update_interval_slider.get())
-        responder.update_response_interval(update_interval)
-        update_interval_slider_label.configure(text=f"Update interval: {update_interval} seconds")
+        if update_interval != responder.response_interval:
+            responder.update_response_interval(update_interval)
+            update_interval_slider_label.configure(text=f"Max response wait: {update_interval} seconds (sooner when a phrase ends)")
 
-    textbox.after(300, update_response_UI, responder, textbox, update_interval_slider_label, update_interval_slider, freeze_state)
+    renderer.textbox.after(RESPONSE_UI_INTERVAL_MS, update_response_UI, pipeline, renderer, update_interval_slider_label, update_interval_slider, freeze_state)
 
-def clear_context(transcriber, audio_queue):
-    transcriber.clear_transcript_data()
-    with audio_queue.mutex:
-        audio_queue.queue.clear()
+def clear_context(pipeline):
+    if pipeline["transcriber"] is None:
+        return
+    pipeline["transcriber"].clear_transcript_data()
+    pipeline["audio_queue"].clear()
 
 def create_ui_components(root):
     ctk.set_appearance_mode("dark")
@@ -66,38 +79,15 @@ def create_ui_components(root):
     return transcript_textbox, response_textbox, update_interval_slider, update_interval_slider_label, freeze_button
 
 def main():
-    try:
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except FileNotFoundError:
-        print("ERROR: The ffmpeg library is not installed. Please install ffmpeg and try again.")
-        return
-
-    root = ctk.CTk()
-    transcript_textbox, response_textbox, update_interval_slider, update_interval_slider_label, freeze_button = create_ui_components(root)
+    pipeline = create_pipeline()
 
-    audio_queue = queue.Queue()
+    with timed_phase("window"):
+        root = ctk.CTk()
+        transcript_textbox, response_textbox, update_interval_slider, update_interval_slider_label, freeze_button = create_ui_components(root)
 
-    user_audio_recorder = AudioRecorder.DefaultMicRecorder()
-    user_audio_recorder.record_into_queue(audio_queue)
-
-    time.sleep(2)
-
-    speaker_audio_recorder = AudioRecorder.DefaultSpeakerRecorder()
-    speaker_audio_recorder.record_into_queue(audio_queue)
-
-    model = TranscriberModels.get_model('--api' in sys.argv)
-
-    transcriber = AudioTranscriber(user_audio_recorder.source, speaker_audio_recorder.source, model)
-    transcribe = threading.Thread(target=transcriber.transcribe_audio_queue, args=(audio_queue,))
-    transcribe.daemon = True
-    transcribe.start()
-
-    responder = GPTResponder()
-    respond = threading.Thread(target=responder.respond_to_transcriber, args=(transcriber,))
-    respond.daemon = True
-    respond.start()
-
-    print("READY")
+    startup = threading.Thread(target=start_pipeline, args=(pipeline,))
+    startup.daemon = True
+    startup.start()
 
     root.grid_rowconfigure(0, weight=100)
     root.grid_rowconfigure(1, weight=1)
@@ -107,7 +97,7 @@ def main():
     root.grid_columnconfigure(1, weight=1)
 
      # Add the clear transcript button to the UI
-    clear_transcript_button = ctk.CTkButton(root, text="Clear Transcript", command=lambda: clear_context(transcriber, audio_queue, ))
+    clear_transcript_button = ctk.CTkButton(root, text="Clear Transcript", command=lambda: clear_context(pipeline))
     clear_transcript_button.grid(row=1, column=0, padx=10, pady=3, sticky="nsew")
 
     freeze_state = [False]  # Using list to be able to change its content inside inner functions
@@ -117,12 +107,16 @@ def main():
 
     freeze_button.configure(command=freeze_unfreeze)
 
-    update_interval_slider_label.configure(text=f"Update interval: {update_interval_slider.get()} seconds")
+    update_interval_slider_label.configure(text=f"Max response wait: {update_interval_slider.get()} seconds (sooner when a phrase ends)")
 
-    update_transcript_UI(transcriber, transcript_textbox)
-    update_response_UI(responder, response_textbox, update_interval_slider_label, update_interval_slider, freeze_state)
+    update_transcript_UI(pipeline, TextboxRenderer(transcript_textbox, readonly=True))
+    update_response_UI(pipeline, TextboxRenderer(response_textbox, readonly=True), update_interval_slider_label, update_interval_slider, freeze_state)
  
     root.mainloop()
 
+    if '--metrics' in sys.argv:
+        metrics.dump_json("metrics.json")
+        print("[INFO] Latency metrics written to metrics.json")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
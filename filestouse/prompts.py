@@ -1,5 +1,14 @@
+from TokenBudget import fit_newest_first
+from TranscriptStore import format_segment
+
 INITIAL_RESPONSE = "Welcome to Ecoute 👋"
-def create_prompt(transcript):
+
+# tokens of transcript sent with every request; the newest phrases that fit are kept
+TRANSCRIPT_TOKEN_BUDGET = 1000
+
+def create_prompt(segments, token_budget=TRANSCRIPT_TOKEN_BUDGET):
+        # segments are (who_spoke, text, time_spoken) tuples, newest first, as in a transcript snapshot
+        transcript = "".join(fit_newest_first([format_segment(who_spoke, text) for who_spoke, text, _ in segments], token_budget))
         return f"""You are a casual pal, genuinely interested in the conversation at hand. A poor transcription of conversation is given below. 
         
 {transcript}.
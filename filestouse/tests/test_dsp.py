@@ -0,0 +1,86 @@
+import warnings
+import numpy as np
+import pytest
+from custom_speech_recognition import dsp
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    # removed in Python 3.13, where there is nothing left to compare with
+    audioop = pytest.importorskip("audioop")
+
+pytestmark = pytest.mark.skipif(dsp.BACKEND != "numpy", reason="dsp falls back to audioop itself without NumPy")
+
+WIDTHS = [1, 2, 3, 4]
+
+def fragment(width, frames, channels=1, seed=0):
+    # random samples, with the most negative and most positive ones at the start so clipping is always exercised
+    extremes = b"\x00" * (width - 1) + b"\x80" + b"\xff" * (width - 1) + b"\x7f"
+    data = np.random.default_rng(seed).integers(0, 256, frames * channels * width, dtype=np.uint8).tobytes()
+    return (extremes * channels + data)[:frames * channels * width]
+
+@pytest.mark.parametrize("width", WIDTHS)
+def test_rms(width):
+    for frames in (0, 1, 1000, 70000):
+        data = fragment(width, frames)
+        assert dsp.rms(data, width) == audioop.rms(data, width)
+
+@pytest.mark.parametrize("width", WIDTHS)
+def test_add(width):
+    first, second = fragment(width, 70000, seed=1), fragment(width, 70000, seed=2)
+    assert dsp.add(first, second, width) == audioop.add(first, second, width)
+    assert dsp.add(first, first, width) == audioop.add(first, first, width)
+
+@pytest.mark.parametrize("width", WIDTHS)
+@pytest.mark.parametrize("bias", [0, 1, -128, 1 << 20, -(1 << 31), (1 << 31) - 1])
+def test_bias(width, bias):
+    data = fragment(width, 70000)
+    assert dsp.bias(data, width, bias) == audioop.bias(data, width, bias)
+
+@pytest.mark.parametrize("width", WIDTHS)
+def test_byteswap(width):
+    data = fragment(width, 70000)
+    assert dsp.byteswap(data, width) == audioop.byteswap(data, width)
+
+@pytest.mark.parametrize("newwidth", WIDTHS)
+@pytest.mark.parametrize("width", WIDTHS)
+def test_lin2lin(width, newwidth):
+    data = fragment(width, 70000)
+    assert dsp.lin2lin(data, width, newwidth) == audioop.lin2lin(data, width, newwidth)
+
+@pytest.mark.parametrize("factors", [(1, 1), (0.5, 0.5), (1, 0), (-1, 2.5)])
+@pytest.mark.parametrize("width", WIDTHS)
+def test_tomono(width, factors):
+    data = fragment(width, 70000, channels=2)
+    assert dsp.tomono(data, width, *factors) == audioop.tomono(data, width, *factors)
+
+@pytest.mark.parametrize("weights", [(1, 0), (3, 2)])
+@pytest.mark.parametrize("rates", [(44100, 16000), (16000, 44100), (48000, 16000), (16000, 16000), (8000, 11025)])
+@pytest.mark.parametrize("channels", [1, 2])
+@pytest.mark.parametrize("width", WIDTHS)
+def test_ratecv_in_chunks(width, channels, rates, weights):
+    # the state returned for one chunk is passed in with the next, as a recorder converting its stream does
+    data = fragment(width, 20000, channels)
+    chunk_frames = np.random.default_rng(3).integers(1, 3000, 50)
+    dsp_state = audioop_state = None
+    start = 0
+    for frames in chunk_frames:
+        chunk = data[start:start + frames * channels * width]
+        start += len(chunk)
+        dsp_output, dsp_state = dsp.ratecv(chunk, width, channels, *rates, dsp_state, *weights)
+        audioop_output, audioop_state = audioop.ratecv(chunk, width, channels, *rates, audioop_state, *weights)
+        assert dsp_output == audioop_output
+        assert dsp_state == audioop_state
+
+@pytest.mark.parametrize("call", [
+    lambda module: module.rms(b"\x00" * 3, 2),
+    lambda module: module.rms(b"\x00" * 4, 5),
+    lambda module: module.add(b"\x00" * 4, b"\x00" * 6, 2),
+    lambda module: module.lin2lin(b"\x00" * 3, 2, 4),
+    lambda module: module.tomono(b"\x00" * 6, 2, 1, 1),
+    lambda module: module.ratecv(b"\x00" * 3, 2, 1, 16000, 8000, None),
+])
+def test_invalid_fragments_raise_like_audioop(call):
+    with pytest.raises(audioop.error):
+        call(audioop)
+    with pytest.raises(dsp.error):
+        call(dsp)
@@ -0,0 +1,147 @@
+import functools
+import io
+import threading
+import numpy as np
+import pytest
+import custom_speech_recognition as sr
+from custom_speech_recognition import dsp
+from custom_speech_recognition.buffer import RingBuffer
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+# seconds of tone in the synthetic stream: phrases, a click and pauses on both sides of pause_threshold
+SPEECH = [(1, 2.5), (3.8, 4.5), (5, 5.15), (6, 9.5), (10, 10.6)]
+
+@functools.lru_cache(maxsize=None)
+def synthetic_pcm(seconds=12, seed=1):
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * SAMPLE_RATE) / SAMPLE_RATE
+    speaking = np.zeros(len(t), dtype=bool)
+    for start, end in SPEECH:
+        speaking |= (t > start) & (t < end)
+    tone = rng.choice([8000, 3000], len(t)) * np.sin(2 * np.pi * 440 * t)
+    samples = np.where(speaking, tone, rng.integers(-300, 301, len(t)))
+    return samples.astype("<i2").tobytes()
+
+class PCMSource(sr.AudioSource):
+    def __init__(self, stream, chunk):
+        self.stream = stream
+        self.CHUNK = chunk
+        self.SAMPLE_RATE = SAMPLE_RATE
+        self.SAMPLE_WIDTH = SAMPLE_WIDTH
+
+class BlockingStream:
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def read(self, size):
+        return self.data.read(size * SAMPLE_WIDTH)
+
+class FakePyAudio:
+    paContinue = 0
+
+    class Stream:
+        def is_stopped(self):
+            return True
+
+        def stop_stream(self):
+            pass
+
+        def close(self):
+            pass
+
+    def open(self, stream_callback, **stream_args):
+        return FakePyAudio.Stream()
+
+def callback_stream(data, block_bytes):
+    # a device thread delivering the audio in blocks of block_bytes while listen reads it
+    audio = FakePyAudio()
+    stream = sr.Microphone.CallbackStream(audio, audio, len(data), SAMPLE_WIDTH, frames_per_buffer=block_bytes // SAMPLE_WIDTH)
+
+    def deliver():
+        for start in range(0, len(data), block_bytes):
+            stream.callback(data[start:start + block_bytes], block_bytes // SAMPLE_WIDTH, None, 0)
+        stream.ring.close()
+
+    device = threading.Thread(target=deliver)
+    device.daemon = True
+    device.start()
+    return stream
+
+def listen_all(stream, chunk, dynamic, phrase_time_limit, timeout):
+    recognizer = sr.Recognizer()
+    recognizer.energy_threshold = 1500
+    recognizer.dynamic_energy_threshold = dynamic
+    source = PCMSource(stream, chunk)
+    results = []
+    for _ in range(10):
+        try:
+            audio = recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+        except sr.WaitTimeoutError:
+            results.append("timeout")
+            continue
+        results.append(audio.frame_data)
+        if not audio.frame_data:
+            break
+    return results, recognizer.energy_threshold
+
+@functools.lru_cache(maxsize=None)
+def blocking_listen(chunk, dynamic, phrase_time_limit, timeout):
+    return listen_all(BlockingStream(synthetic_pcm()), chunk, dynamic, phrase_time_limit, timeout)
+
+@pytest.mark.parametrize("block_bytes", [100, 4096, 20000])
+@pytest.mark.parametrize("timeout", [None, 0.7])
+@pytest.mark.parametrize("phrase_time_limit", [None, 1.2])
+@pytest.mark.parametrize("dynamic", [False, True])
+@pytest.mark.parametrize("chunk", [512, 1024, 1500])
+def test_callback_stream_finds_the_same_phrases_as_blocking_reads(chunk, dynamic, phrase_time_limit, timeout, block_bytes):
+    expected, expected_threshold = blocking_listen(chunk, dynamic, phrase_time_limit, timeout)
+    phrases, threshold = listen_all(callback_stream(synthetic_pcm(), block_bytes), chunk, dynamic, phrase_time_limit, timeout)
+    assert phrases == expected
+    assert threshold == pytest.approx(expected_threshold)
+
+def test_blocking_reads_find_the_spoken_phrases():
+    phrases, _ = blocking_listen(1024, False, None, None)
+    # the pauses around the click at 5 s and before 10 s are shorter than pause_threshold, so those join their neighbours
+    assert [len(phrase) > 0 for phrase in phrases] == [True, True, True, False]
+
+def test_ring_buffer_wraps_around():
+    ring = RingBuffer(8, 2)
+    ring.write(b"abcdef")
+    assert ring.peek(4) == b"abcd"
+    ring.consume(4)
+    ring.write(b"ghijkl")  # two bytes fit before the end of the ring, the rest wraps to its start
+    assert len(ring) == 8
+    assert ring.peek(8) == b"efghijkl"
+    ring.consume(6)
+    assert ring.peek(8) == b"kl"
+    assert ring.dropped == 0
+
+def test_ring_buffer_overflow_keeps_only_whole_frames():
+    ring = RingBuffer(10, 4)
+    assert ring.size == 8
+    ring.write(b"aaaa")
+    ring.write(b"bbbbcccc")  # only one of the two frames fits
+    assert ring.dropped == 4
+    assert ring.peek(8) == b"aaaabbbb"
+    ring.consume(2)
+    ring.write(b"dddd")  # two bytes are free, which is not a whole frame
+    assert ring.dropped == 8
+    assert ring.peek(8) == b"aabbbb"
+    ring.consume(2)
+    ring.write(b"eeee")
+    assert ring.peek(8) == b"bbbbeeee"
+
+def test_ring_buffer_wait_returns_after_close():
+    ring = RingBuffer(8, 2)
+    ring.write(b"ab")
+    ring.close()
+    assert not ring.wait(4, timeout=5)
+    assert ring.peek(8) == b"ab"
+
+@pytest.mark.parametrize("width", [1, 2, 3, 4])
+def test_rms_windows_matches_rms_of_every_window(width):
+    fragment = np.random.default_rng(width).integers(0, 256, 1000 * width, dtype=np.uint8).tobytes()
+    window = 64 * width
+    expected = [dsp.rms(fragment[start:start + window], width) for start in range(0, len(fragment), window)]
+    assert dsp.rms_windows(fragment, width, window) == expected